@@ -2,8 +2,9 @@ from fastapi import FastAPI, UploadFile, File, Form
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, JSONResponse
 from app.storage import save_to_efs, save_bumper_to_efs
-from app.rabbitmq import publish_message, rabbitmq_listener
+from app.rabbitmq import publish_message, rabbitmq_listener, progress_listener
 from app.state import state
+from render_profiles import get_render_profile
 import uuid, json
 import os
 from datetime import datetime
@@ -16,6 +17,7 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 @app.on_event("startup")
 async def startup_event():
     asyncio.create_task(rabbitmq_listener())
+    asyncio.create_task(progress_listener())
 
 @app.get("/debug-ready")
 async def debug_ready():
@@ -24,10 +26,34 @@ async def debug_ready():
 @app.get("/check-download/{file_id}")
 async def check_download(file_id: str):
     print(f"check-download called for file_id: {file_id}")
-    if file_id in state.ready_downloads:
-        return JSONResponse(content={"ready": True, "download_url": f"/download/{file_id}"})
-    else:
-        return JSONResponse(content={"ready": False})
+    content = {"ready": file_id in state.ready_downloads}
+    if content["ready"]:
+        content["download_url"] = f"/download/{file_id}"
+    if file_id in state.stream_playlists:
+        content["stream_url"] = f"/stream/{file_id}/index.m3u8"
+    return JSONResponse(content=content)
+
+@app.get("/check-progress/{file_id}")
+async def check_progress(file_id: str):
+    progress = state.render_progress.get(file_id)
+    if not progress:
+        return JSONResponse(content={"stage": "queued"})
+    return JSONResponse(content=progress)
+
+HLS_MEDIA_TYPES = {".m3u8": "application/vnd.apple.mpegurl", ".ts": "video/mp2t"}
+
+@app.get("/stream/{file_id}/{name}")
+async def stream_file(file_id: str, name: str):
+    playlist_path = state.stream_playlists.get(file_id)
+    media_type = HLS_MEDIA_TYPES.get(os.path.splitext(name)[1])
+    if not playlist_path or not media_type or name != os.path.basename(name):
+        return JSONResponse(status_code=404, content={"error": "Stream not available"})
+    file_path = os.path.join(os.path.dirname(playlist_path), name)
+    if not os.path.exists(file_path):
+        return JSONResponse(status_code=404, content={"error": "Stream not available"})
+    # The playlist keeps growing until the job finishes, so never cache it.
+    headers = {"Cache-Control": "no-cache"} if media_type.endswith("mpegurl") else None
+    return FileResponse(file_path, media_type=media_type, headers=headers)
 
 @app.get("/download/{file_id}")
 async def download_file(file_id: str):
@@ -44,6 +70,7 @@ async def upload_files(
      voice: str = Form(...),
      tts_engine: str = Form(...),
      piperParams: str = Form(None),
+     render_profile: str = Form("standard"),
 ):
     file_id = str(uuid.uuid4())
     job_id = hashlib.sha256(datetime.utcnow().isoformat().encode()).hexdigest()[:10]
@@ -62,7 +89,9 @@ async def upload_files(
         "job_id": job_id,
         "voice": voice,
         "tts_engine": tts_engine,
-        "piper_args": piper_args
+        "piper_args": piper_args,
+        # Resolved once here so every stage renders to the same frame
+        "render_profile": get_render_profile(render_profile)
     }
 
     metadata["file_path"] = save_to_efs(ppt, ppt.filename, metadata)
@@ -3,6 +3,7 @@ from celery import Celery
 import json
 import aio_pika
 from app.state import state
+from progress_queue import RENDER_PROGRESS_ARGUMENTS, RENDER_PROGRESS_QUEUE
 
 # Environment-based configuration
 RABBITMQ_HOST = os.environ.get("RABBITMQ_HOST", "rabbitmq")
@@ -28,7 +29,7 @@ def publish_message(data: dict):
     The task must be registered as @celery_app.task in the worker side.
     """
     task_name = "tasks.process_pptx"  # must match your worker task name
-    args = [data["file_path"], data["filename"], data["file_id"], data["job_id"], data["voice"], data["tts_engine"], data["piper_args"]]  # match task signature
+    args = [data["file_path"], data["filename"], data["file_id"], data["job_id"], data["voice"], data["tts_engine"], data["piper_args"], data["render_profile"]]  # match task signature
 
     result = celery_app.send_task(
         name=task_name,
@@ -57,7 +58,30 @@ async def rabbitmq_listener():
                             job_id = data["job_id"]
                             state.ready_downloads[file_id] = file_path
                             print(f"Video from job with id {job_id} associated with file id {file_id} ready at {file_path}")
+                        elif data["event"] == "stream-ready":
+                            state.stream_playlists[data["file_id"]] = data["file_path"]
+                            print(f"Progressive stream for job {data['job_id']} available at {data['file_path']}")
                     except Exception as inner:
                         print(f"Error handling message: {inner}") 
     except Exception as outer:
         print(f"Failed to connect or consume RabbitMQ: {outer}")
+
+async def progress_listener():
+    """Keeps the latest render-progress event per file_id."""
+    print("Starting render progress listener...")
+    try:
+        connection = await aio_pika.connect_robust(CELERY_BROKER_URL)
+        channel = await connection.channel()
+        queue = await channel.declare_queue(RENDER_PROGRESS_QUEUE, durable=True, arguments=RENDER_PROGRESS_ARGUMENTS)
+
+        async with queue.iterator() as queue_iter:
+            async for message in queue_iter:
+                async with message.process():
+                    try:
+                        data = json.loads(message.body)
+                        if data.get("event") == "render-progress":
+                            state.render_progress[data["file_id"]] = data
+                    except Exception as inner:
+                        print(f"Error handling progress message: {inner}")
+    except Exception as outer:
+        print(f"Failed to connect or consume render progress: {outer}")
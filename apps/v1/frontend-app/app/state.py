@@ -1,5 +1,7 @@
 class State:
     def __init__(self):
         self.ready_downloads = {}
+        self.stream_playlists = {}
+        self.render_progress = {}
 
 state = State()
@@ -0,0 +1,114 @@
+"""
+Rasterization memory benchmark for the PPTX extractor.
+
+Renders one PDF with each mode in a fresh child process and reports wall
+time and peak RSS of that process (ru_maxrss) and of its largest pdftoppm
+child:
+
+  all-at-once  the original convert_from_path() into a list of PIL images,
+               saved after every page is decoded
+  streaming    image_extractor.rasterize_pdf on one worker (page batches
+               written straight to files)
+  parallel     image_extractor.rasterize_pdf on RASTER_WORKERS (default the
+               pod's available cores), one pdftoppm per batch
+
+Without --pdf a synthetic widescreen deck is generated with PyMuPDF. The
+extractor image has everything it needs (poppler, pdf2image, PyMuPDF), so
+run it there to get numbers from the deployed pdftoppm build and CPU limit:
+
+    python bench_raster.py --pages 150
+    python bench_raster.py --pdf /artifacts/uploads/big-deck.pdf
+    kubectl -n event-poc exec deploy/ppt-extractor-service -- \
+        /opt/conda/envs/pptx_extractor_env/bin/python bench_raster.py --pages 300
+
+The table ends with each mode's peak RSS relative to all-at-once, the
+before/after figure for the deck.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def build_pdf(pdf_path: Path, pages: int):
+    import fitz
+
+    doc = fitz.open()
+    for i in range(1, pages + 1):
+        # 13.333 x 7.5 in, the default 16:9 slide size
+        page = doc.new_page(width=960, height=540)
+        page.draw_rect(fitz.Rect(0, 0, 960, 540), color=None, fill=((i * 37 % 255) / 255, 0.55, 0.75))
+        page.draw_rect(fitz.Rect(60, 140, 900, 480), color=(0, 0, 0), fill=(1, 1, 1))
+        page.insert_text((60, 100), f"Benchmark slide {i}", fontsize=44)
+        for line in range(8):
+            page.insert_text((90, 190 + line * 36), f"Bullet {line + 1}: synthetic content for page {i}", fontsize=22)
+    doc.save(str(pdf_path))
+
+
+def run_mode(mode: str, pdf_path: Path, out_dir: Path):
+    import image_extractor
+    from pdf2image import convert_from_path
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    if mode == "all-at-once":
+        images = convert_from_path(str(pdf_path), dpi=image_extractor.DPI)
+        for i, img in enumerate(images, start=1):
+            img.save(out_dir / f"slide_{i:02d}.png")
+        pages = len(images)
+    elif mode == "streaming":
+        pages = image_extractor.rasterize_pdf(pdf_path, out_dir, workers=1)
+    else:
+        pages = image_extractor.rasterize_pdf(pdf_path, out_dir)
+    print(json.dumps({
+        "pages": pages,
+        "wall": time.perf_counter() - start,
+        "worker_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "child_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", type=Path, default=None)
+    parser.add_argument("--pages", type=int, default=150, help="pages of the synthetic deck")
+    parser.add_argument("--modes", nargs="+", default=["all-at-once", "streaming", "parallel"])
+    parser.add_argument("--workdir", type=Path, default=None)
+    parser.add_argument("--run-mode", help=argparse.SUPPRESS)
+    parser.add_argument("--out-dir", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        run_mode(args.run_mode, args.pdf, args.out_dir)
+        return
+
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="bench-raster-"))
+    pdf_path = args.pdf
+    if pdf_path is None:
+        pdf_path = workdir / "deck.pdf"
+        print(f"Building {args.pages}-page deck at {pdf_path} ...")
+        build_pdf(pdf_path, args.pages)
+
+    print(f"{'mode':<12} {'pages':>6} {'wall s':>8} {'peak RSS MB':>12} {'child RSS MB':>13} {'vs all-at-once':>15}")
+    baseline = None
+    for mode in args.modes:
+        # A fresh interpreter per mode, since ru_maxrss only ever grows
+        result = subprocess.run([
+            sys.executable, __file__, "--run-mode", mode,
+            "--pdf", str(pdf_path), "--out-dir", str(workdir / mode)
+        ], stdout=subprocess.PIPE, text=True, check=True)
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        peak_mb = max(stats['worker_mb'], stats['child_mb'])
+        if mode == "all-at-once":
+            baseline = peak_mb
+        relative = f"{peak_mb / baseline:.0%}" if baseline else "-"
+        print(f"{mode:<12} {stats['pages']:>6} {stats['wall']:>8.2f} {stats['worker_mb']:>12.0f} "
+              f"{stats['child_mb']:>13.0f} {relative:>15}")
+
+
+if __name__ == "__main__":
+    main()
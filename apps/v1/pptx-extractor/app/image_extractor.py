@@ -1,7 +1,13 @@
+import re
 import subprocess
-import shlex
+import resource
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PIL import Image, ImageOps
+from office_pool import OfficePool
+from cpu_limits import available_cpus
 import os
 
 
@@ -10,36 +16,145 @@ RES_HEIGHT = int(os.getenv("RES_HEIGHT", "720"))
 
 SLIDE_WIDTH_IN = float(os.getenv("SLIDE_WIDTH_INCHES", "13.333"))
 DPI = int(round(RES_WIDTH / 13.333))
+# png is lossless but slow to compress; jpeg is smaller and quicker to write;
+# ppm is uncompressed, the cheapest to write and for ffmpeg to decode.
+SLIDE_IMAGE_FORMAT = os.getenv("SLIDE_IMAGE_FORMAT", "png").lower()
+IMAGE_EXTENSIONS = {"png": "png", "jpeg": "jpg", "ppm": "ppm"}
+if SLIDE_IMAGE_FORMAT not in IMAGE_EXTENSIONS:
+    raise ValueError(f"Unknown SLIDE_IMAGE_FORMAT: {SLIDE_IMAGE_FORMAT}")
+JPEG_QUALITY = int(os.getenv("SLIDE_JPEG_QUALITY", "95"))
+# Pages per pdftoppm call. Pages go straight to files instead of being
+# decoded into memory, so peak RSS stays flat however long the deck is.
+RASTER_BATCH_PAGES = int(os.getenv("RASTER_BATCH_PAGES", "8"))
+# Batches rendered at once, each by its own pdftoppm process (0 = the available
+# cores split between the WORKER_CONCURRENCY Celery processes)
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "1"))
+RASTER_WORKERS = int(os.getenv("RASTER_WORKERS", "0")) or max(1, available_cpus() // max(1, WORKER_CONCURRENCY))
 
-def convert_pptx_to_images(pptx_path: Path, output_dir: Path, image_format="png"):
-    output_dir.mkdir(parents=True, exist_ok=True)
+# Long-lived LibreOffice instances (unoserver) shared by the worker processes.
+# 0 turns the pool off and every conversion runs the libreoffice CLI.
+OFFICE_POOL_SIZE = int(os.getenv("OFFICE_POOL_SIZE", "0"))
+OFFICE_POOL_DIR = os.getenv("OFFICE_POOL_DIR", "/tmp/office-pool")
+OFFICE_BASE_PORT = int(os.getenv("OFFICE_BASE_PORT", "2003"))
+UNOSERVER_PYTHON = os.getenv("UNOSERVER_PYTHON", "/usr/bin/python3")
+OFFICE_CONVERT_TIMEOUT = int(os.getenv("OFFICE_CONVERT_TIMEOUT", "180"))
+OFFICE_START_TIMEOUT = int(os.getenv("OFFICE_START_TIMEOUT", "60"))
 
-    # Step 1: Convert PPTX to PDF
-    pdf_path = pptx_path.with_suffix(".pdf")
-    try:
-        cmd = f"libreoffice --headless --convert-to pdf {shlex.quote(str(pptx_path))} --outdir {shlex.quote(str(pptx_path.parent))}"
-        print("🛠 Running command:", cmd)
+office_pool = OfficePool(
+    OFFICE_POOL_SIZE, OFFICE_POOL_DIR, OFFICE_BASE_PORT, UNOSERVER_PYTHON,
+    start_timeout=OFFICE_START_TIMEOUT, acquire_timeout=OFFICE_CONVERT_TIMEOUT
+) if OFFICE_POOL_SIZE > 0 else None
+
+def log_peak_rss(label):
+    worker_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print(f"📈 Peak RSS after {label}: worker {worker_kb / 1024:.0f} MB, largest child {child_kb / 1024:.0f} MB")
+
+def raster_size(pdf_info, frame):
+    """pdftoppm scale-to size that fits the page inside frame, keeping its aspect ratio."""
+    width, height = frame
+    page = re.match(r"([\d.]+) x ([\d.]+)", pdf_info.get("Page size", ""))
+    if page and float(page[1]) / float(page[2]) < width / height:
+        return (None, height)
+    return (width, None)
+
+def fit_to_frame(image_path: Path, frame, image_format):
+    """Letterbox an image to exactly frame, as the video producer's pad would."""
+    with Image.open(image_path) as img:
+        if img.size == tuple(frame):
+            return
+        fitted = ImageOps.pad(img.convert("RGB"), frame, color="black")
+    fitted.save(image_path, format=image_format.upper(), quality=JPEG_QUALITY)
+
+def rasterize_pages(pdf_path: Path, output_dir: Path, first_page: int, last_page: int, image_format="png",
+                    size=None, frame=None):
+    """Render a page range with pdftoppm straight to slide_NN files."""
+    extension = IMAGE_EXTENSIONS[image_format]
+    # Scratch lives in output_dir so the renames below stay on one filesystem
+    with tempfile.TemporaryDirectory(dir=output_dir, prefix=".raster-") as scratch:
+        paths = convert_from_path(
+            str(pdf_path), dpi=DPI, first_page=first_page, last_page=last_page, size=size,
+            output_folder=scratch, fmt=image_format, jpegopt={"quality": JPEG_QUALITY}, paths_only=True
+        )
+        for page, path in enumerate(sorted(paths), start=first_page):
+            slide_path = output_dir / f"slide_{page:02d}.{extension}"
+            os.replace(path, slide_path)
+            # Pages already matching the frame are only checked by their header
+            if frame:
+                fit_to_frame(slide_path, frame, image_format)
+
+def rasterize_pdf(pdf_path: Path, output_dir: Path, image_format="png", workers=None, frame=None):
+    pdf_info = pdfinfo_from_path(str(pdf_path))
+    page_count = pdf_info["Pages"]
+    size = raster_size(pdf_info, frame) if frame else None
+    workers = workers or RASTER_WORKERS
+    # Short decks are split evenly so every worker gets a share
+    batch_pages = max(1, min(RASTER_BATCH_PAGES, -(-page_count // workers)))
+    ranges = [
+        (first_page, min(first_page + batch_pages - 1, page_count))
+        for first_page in range(1, page_count + 1, batch_pages)
+    ]
+    with ThreadPoolExecutor(max_workers=min(workers, len(ranges) or 1)) as pool:
+        futures = [
+            pool.submit(rasterize_pages, pdf_path, output_dir, first_page, last_page, image_format, size, frame)
+            for first_page, last_page in ranges
+        ]
+        for future in futures:
+            future.result()
+    return page_count
 
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        print("✅ stdout:", result.stdout)
-        print("❌ stderr:", result.stderr)
+def convert_with_cli(pptx_path: Path):
+    # One profile per worker process: concurrent conversions don't fight over
+    # the default profile, and each process only initializes its own once
+    profile = Path(OFFICE_POOL_DIR) / f"cli-{os.getpid()}"
+    profile.mkdir(parents=True, exist_ok=True)
+    cmd = [
+        "libreoffice", f"-env:UserInstallation={profile.as_uri()}",
+        "--headless", "--convert-to", "pdf", str(pptx_path), "--outdir", str(pptx_path.parent)
+    ]
+    print("🛠 Running command:", " ".join(cmd))
 
-        if result.returncode != 0:
-            raise RuntimeError("LibreOffice PDF conversion failed")
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=OFFICE_CONVERT_TIMEOUT)
+    print("✅ stdout:", result.stdout)
+    print("❌ stderr:", result.stderr)
 
+    if result.returncode != 0:
+        raise RuntimeError("LibreOffice PDF conversion failed")
+
+def convert_to_pdf(pptx_path: Path, pdf_path: Path):
+    if office_pool:
+        try:
+            office_pool.convert(pptx_path, pdf_path, "pdf", OFFICE_CONVERT_TIMEOUT)
+            print(f"✅ Converted {pptx_path.name} to PDF on the office pool")
+            return
+        except Exception as e:
+            print(f"⚠️ Office pool conversion failed ({e}), falling back to the libreoffice CLI")
+    try:
+        convert_with_cli(pptx_path)
     except Exception as e:
         print(f"❌ LibreOffice conversion failed: {e}")
         raise
 
+def convert_pptx_to_images(pptx_path: Path, output_dir: Path, image_format=SLIDE_IMAGE_FORMAT, frame=None):
+    """
+    Render every slide to output_dir. With frame=(width, height), the job's
+    video size, slides are fitted and padded to it so the video producer can
+    skip its scale/pad filter; without it pages render at DPI.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Step 1: Convert PPTX to PDF
+    pdf_path = pptx_path.with_suffix(".pdf")
+    convert_to_pdf(pptx_path, pdf_path)
+
     if not pdf_path.exists():
         print("❌ PDF was not created after LibreOffice conversion")
         raise FileNotFoundError(f"Expected PDF not found at {pdf_path}")
 
-    # Step 2: Convert PDF to images
-    images = convert_from_path(str(pdf_path), dpi=DPI)
-    print(f"✅ {len(images)} slides extracted from PDF")
-
-    for i, img in enumerate(images, start=1):
-        img.save(output_dir / f"slide_{i:02d}.{image_format}")
+    # Step 2: Convert PDF to images, batches of pages in parallel
+    page_count = rasterize_pdf(pdf_path, output_dir, image_format, frame=frame)
+    print(f"✅ {page_count} slides extracted from PDF" + (f" at {frame[0]}x{frame[1]}" if frame else "")
+          + f" as {image_format}")
+    log_peak_rss("rasterizing")
 
-    return sorted(output_dir.glob(f"slide_*.{image_format}"))
+    return sorted(output_dir.glob(f"slide_*.{IMAGE_EXTENSIONS[image_format]}"))
@@ -0,0 +1,193 @@
+import fcntl
+import http.client
+import os
+import signal
+import subprocess
+import tempfile
+import time
+import xmlrpc.client
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class _TimeoutTransport(xmlrpc.client.Transport):
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        return http.client.HTTPConnection(host, timeout=self.timeout)
+
+
+class OfficeInstance:
+    """
+    One long-lived headless LibreOffice behind a unoserver XML-RPC listener on
+    127.0.0.1, with its own user profile so instances never share state.
+
+    Instances are shared by every worker process in the container: a process
+    uses one only while holding its lock file, and the daemon's pid is kept
+    next to it, so whichever process finds the instance dead or hung can
+    restart it.
+    """
+
+    def __init__(self, index, state_dir, base_port, python):
+        self.index = index
+        self.port = base_port + 2 * index
+        self.uno_port = self.port + 1
+        self.python = python
+        self.profile = state_dir / f"profile-{index}"
+        self.lock_path = state_dir / f"instance-{index}.lock"
+        self.pid_path = state_dir / f"instance-{index}.pid"
+
+    def _proxy(self, timeout):
+        return xmlrpc.client.ServerProxy(f"http://127.0.0.1:{self.port}", allow_none=True,
+                                         transport=_TimeoutTransport(timeout))
+
+    def _pid(self):
+        try:
+            return int(self.pid_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def healthy(self, timeout):
+        pid = self._pid()
+        if pid is None:
+            return False
+        try:
+            os.kill(pid, 0)
+            self._proxy(timeout).info()
+            return True
+        except (OSError, xmlrpc.client.Error):
+            return False
+
+    def stop(self):
+        pid = self._pid()
+        self.pid_path.unlink(missing_ok=True)
+        if pid is None:
+            return
+        # The daemon leads its own session, so this takes soffice down with it
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                os.killpg(pid, sig)
+            except ProcessLookupError:
+                return
+            for _ in range(50):
+                try:
+                    os.kill(pid, 0)
+                except ProcessLookupError:
+                    return
+                time.sleep(0.1)
+
+    def start(self, timeout):
+        self.stop()
+        self.profile.mkdir(parents=True, exist_ok=True)
+        proc = subprocess.Popen([
+            self.python, "-m", "unoserver.server",
+            "--interface", "127.0.0.1",
+            "--port", str(self.port),
+            "--uno-port", str(self.uno_port),
+            # A plain path: unoserver turns it into a file URI itself
+            "--user-installation", str(self.profile),
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        self.pid_path.write_text(str(proc.pid))
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                break
+            if self.healthy(timeout=2):
+                print(f"🟢 Office instance {self.index} listening on port {self.port}")
+                return
+            time.sleep(0.5)
+        self.stop()
+        raise RuntimeError(f"Office instance {self.index} did not come up within {timeout}s")
+
+    def convert(self, source: Path, dest: Path, convert_to, timeout):
+        self._proxy(timeout).convert(str(source), None, str(dest), convert_to)
+
+
+class OfficePool:
+    """
+    A fixed set of OfficeInstances. convert() takes the first free instance,
+    health-checks it (starting or restarting it when needed) and kills it if a
+    conversion fails or hangs, so the next caller gets a fresh one.
+
+    self_check() runs a real conversion through the pool; the worker does so
+    on startup, and it can be run by hand inside the container:
+
+        python -c "import image_extractor; image_extractor.office_pool.self_check()"
+    """
+
+    def __init__(self, size, state_dir, base_port, python, start_timeout=60, health_timeout=5,
+                 acquire_timeout=120):
+        self.state_dir = Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        self.instances = [OfficeInstance(i, self.state_dir, base_port, python) for i in range(size)]
+        self.start_timeout = start_timeout
+        self.health_timeout = health_timeout
+        self.acquire_timeout = acquire_timeout
+
+    def _try_lock(self, instance):
+        lock = open(instance.lock_path, "w")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return None
+        return lock
+
+    def _ensure_running(self, instance):
+        if not instance.healthy(self.health_timeout):
+            print(f"🔄 Office instance {instance.index} is not responding, (re)starting it")
+            instance.start(self.start_timeout)
+
+    @contextmanager
+    def _acquire(self):
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            for instance in self.instances:
+                lock = self._try_lock(instance)
+                if lock is None:
+                    continue
+                try:
+                    yield instance
+                finally:
+                    lock.close()
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"No free office instance within {self.acquire_timeout}s")
+            time.sleep(0.2)
+
+    def prewarm(self):
+        """Start every idle instance that isn't already up."""
+        for instance in self.instances:
+            lock = self._try_lock(instance)
+            if lock is None:
+                continue
+            try:
+                self._ensure_running(instance)
+            except Exception as e:
+                print(f"⚠️ Could not prewarm office instance {instance.index}: {e}")
+            finally:
+                lock.close()
+
+    def convert(self, source: Path, dest: Path, convert_to="pdf", timeout=180):
+        with self._acquire() as instance:
+            self._ensure_running(instance)
+            try:
+                instance.convert(source, dest, convert_to, timeout)
+            except Exception:
+                # A failed or timed-out conversion may leave soffice wedged
+                print(f"⚠️ Office instance {instance.index} failed converting {source.name}, restarting it")
+                instance.stop()
+                raise
+
+    def self_check(self, timeout=60):
+        """Convert a one-line document to PDF through the pool, raising if that fails."""
+        with tempfile.TemporaryDirectory(prefix="office-check-") as scratch:
+            source = Path(scratch) / "check.txt"
+            source.write_text("office pool self-check\n")
+            dest = source.with_suffix(".pdf")
+            self.convert(source, dest, "pdf", timeout)
+            if not dest.exists() or dest.read_bytes()[:5] != b"%PDF-":
+                raise RuntimeError("Office pool self-check produced no PDF")
+        print("✅ Office pool self-check converted a document")
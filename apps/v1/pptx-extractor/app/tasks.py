@@ -1,8 +1,12 @@
 import os
+import shutil
 from celery import Celery
+from celery.signals import worker_ready
 from pathlib import Path
 from note_extractor import extract_notes
-from image_extractor import convert_pptx_to_images
+from image_extractor import convert_pptx_to_images, office_pool
+from job_barrier import FileBarrier
+from render_profiles import get_render_profile
 
 # Environment-based configuration
 RABBITMQ_HOST = os.environ.get("RABBITMQ_HOST", "rabbitmq")
@@ -30,13 +34,60 @@ SLIDES_DIR.mkdir(parents=True, exist_ok=True)
 NOTES_DIR = Path(os.getenv("NOTES_DIR", "/artifacts/notes/"))
 NOTES_DIR.mkdir(parents=True, exist_ok=True)
 
+# Slide images and TTS audio are produced concurrently; the stage that
+# finishes second starts the video. Shared with the TTS service.
+STAGES_DIR = Path(os.getenv("STAGES_DIR", "/artifacts/stages/"))
+
+def stage_barrier(job_id):
+    return FileBarrier(STAGES_DIR / job_id, 2)
+
+def slides_stage_done(job_id, ok=True):
+    """
+    Record the slides side of the job's stage barrier. True when the audio is
+    already done and both stages succeeded, i.e. this task starts the video.
+    The barrier is removed once both sides have arrived.
+    """
+    barrier = stage_barrier(job_id)
+    if not barrier.arrive("slides", ok):
+        print(f"Slides for job {job_id} {'are ready' if ok else 'failed'}, TTS will finish the job")
+        return False
+    failed = barrier.failed()
+    shutil.rmtree(STAGES_DIR / job_id, ignore_errors=True)
+    if failed:
+        print(f"❌ Job {job_id}: {', '.join(failed)} stage failed, not starting the video")
+        return False
+    print(f"Audio for job {job_id} is already done, starting the video")
+    return True
+
+def start_video(job_id, file_id, render_profile):
+    result = celery_app.send_task(
+        name="ffmpeg_service.produce_video",
+        args=[job_id, file_id, render_profile],
+        queue="video_producer",
+    )
+    print(f"Task sent from ppt_tasks, result: {result}")
+
+@worker_ready.connect
+def prewarm_office_pool(**kwargs):
+    # Start the LibreOffice instances before the first deck arrives, and make
+    # sure they really convert rather than finding out on every job
+    if office_pool:
+        office_pool.prewarm()
+        try:
+            office_pool.self_check()
+        except Exception as e:
+            print(f"❌ Office pool self-check failed, conversions will use the libreoffice CLI: {e}")
+
 @celery_app.task(queue='ppt_tasks', name="tasks.process_pptx")
-def process_pptx(file_path, filename, file_id, job_id, tts_voice, tts_engine, piper_args):
+def process_pptx(file_path, filename, file_id, job_id, tts_voice, tts_engine, piper_args, render_profile="standard"):
     """
     Processes the PowerPoint file by extracting notes and converting slides to images.
     """
     print(f"Called process_pptx, file_path: {file_path}")
     pptx_path = Path(file_path)
+    # Normally resolved by the frontend; a bare name is resolved here, once,
+    # and the settings travel on to TTS and the video producer
+    profile = get_render_profile(render_profile)
     try:
         # Extract notes from the PowerPoint file.
         print("Extracting notes...")
@@ -44,11 +95,29 @@ def process_pptx(file_path, filename, file_id, job_id, tts_voice, tts_engine, pi
         NOTES_JOB_DIR.mkdir(parents=True, exist_ok=True)
         extract_notes(pptx_path, NOTES_JOB_DIR)
 
+        # Narration doesn't need the images, so TTS starts on the notes right away
+        shutil.rmtree(STAGES_DIR / job_id, ignore_errors=True)
+        task_name = "tts_processor.synthesize"
+        args = [str(NOTES_JOB_DIR), job_id, tts_voice, tts_engine, piper_args, file_id, profile, True]
+        result = celery_app.send_task(
+            name=task_name,
+            args=args,
+            queue="tts_tasks",
+        )
+
         print("Converting pptx to images...")
         # Convert PPTX slides to images.
         IMS_JOB_DIR = SLIDES_DIR / job_id
         IMS_JOB_DIR.mkdir(parents=True, exist_ok=True)
-        convert_pptx_to_images(pptx_path, IMS_JOB_DIR)
+        try:
+            slide_images = convert_pptx_to_images(pptx_path, IMS_JOB_DIR,
+                                                  frame=(int(profile["width"]), int(profile["height"])))
+        except Exception:
+            # Keeps the TTS side from starting a video without slides
+            slides_stage_done(job_id, ok=False)
+            raise
+        if slides_stage_done(job_id):
+            start_video(job_id, file_id, profile)
         # Optionally, you can store or send results here (e.g., update a database).
         mdata = {
             "status": "processed",
@@ -59,17 +128,10 @@ def process_pptx(file_path, filename, file_id, job_id, tts_voice, tts_engine, pi
             "tts_engine": tts_engine,
             "piper_args": piper_args,
             "file_id": file_id,
-            "slides_processed": len(list(SLIDES_DIR.glob("slide_*.png")))
+            "render_profile": profile,
+            "slides_processed": len(slide_images)
         }
         print(f"Successfully processed {filename}.")
-
-        task_name = "tts_processor.synthesize"
-        args = [mdata["notes_dir"], mdata["job_id"], mdata["voice"], mdata["tts_engine"], mdata["piper_args"], mdata["file_id"]]
-        result = celery_app.send_task(
-            name=task_name,
-            args=args,
-            queue="tts_tasks",
-        )
         return mdata
     except Exception as e:
         # Handle exceptions, log errors, or trigger retries as needed.
@@ -0,0 +1,134 @@
+import hashlib
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+
+
+def file_digest(path, *params):
+    """sha256 over a file's bytes plus the parameters that shape its rendering."""
+    return files_digest([path], *params)
+
+
+def files_digest(paths, *params):
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        h.update(b"\0")
+    for param in params:
+        h.update(b"\0" + str(param).encode())
+    return h.hexdigest()
+
+
+def link_or_copy(src, dest):
+    """Hard-link src to dest, copying when the filesystem cannot link."""
+    dest = Path(dest)
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+    return dest
+
+
+class ArtifactCache:
+    """
+    Content-addressed media cache on the shared artifacts volume.
+
+    Entries are named by key. A hit refreshes the entry's mtime, and eviction
+    drops the oldest entries once the directory grows past max_bytes, giving
+    LRU behaviour that every worker sharing the volume agrees on. A max_bytes
+    of 0 disables the cache. Hit/miss counts are per instance, so build one
+    per job to report that job's numbers. locked(key) serializes callers on
+    one key within the process, so work repeated inside a job is produced
+    once and then hit.
+    """
+
+    def __init__(self, root, max_bytes, suffix=".mp4"):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        if self.enabled:
+            self.root.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def locked(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def path_for(self, key):
+        return self.root / f"{key}{self.suffix}"
+
+    def lookup(self, key):
+        path = self.path_for(key)
+        try:
+            if not self.enabled:
+                raise FileNotFoundError(path)
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def temp_path(self, key):
+        """Scratch path to render into before commit(); ignored by eviction."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        return self.root / f".{key}.{uuid.uuid4().hex}.tmp{self.suffix}"
+
+    def commit(self, key, temp_path, evict=True):
+        """
+        Atomically publish a rendered file under key and enforce the size
+        bound. Pass evict=False when committing many entries and call evict()
+        once afterwards.
+        """
+        path = self.path_for(key)
+        os.replace(temp_path, path)
+        if evict:
+            self.evict()
+        return path
+
+    def store(self, key, path):
+        """Publish a copy of a finished file under key, leaving the original in place."""
+        if not self.enabled:
+            return
+        temp_path = self.temp_path(key)
+        link_or_copy(path, temp_path)
+        os.replace(temp_path, self.path_for(key))
+
+    def evict(self):
+        if not self.enabled:
+            return
+        entries = []
+        for entry in self.root.glob(f"*{self.suffix}"):
+            if entry.name.startswith("."):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+            print(f"🧹 Evicted {entry.name} from {self.root}")
@@ -0,0 +1,41 @@
+import math
+import os
+from pathlib import Path
+
+# cgroup v2 keeps "<quota> <period>" in one file; v1 splits them, and a
+# quota of -1 (v1) or "max" (v2) means no limit
+CGROUP_V2_CPU_MAX = Path("/sys/fs/cgroup/cpu.max")
+CGROUP_V1_CPU_DIR = Path("/sys/fs/cgroup/cpu")
+
+
+def cgroup_cpu_quota():
+    """CPUs allowed by the container's CFS quota (rounded up), or None when unlimited."""
+    try:
+        quota, period = CGROUP_V2_CPU_MAX.read_text().split()[:2]
+    except (OSError, ValueError):
+        try:
+            quota = (CGROUP_V1_CPU_DIR / "cpu.cfs_quota_us").read_text().strip()
+            period = (CGROUP_V1_CPU_DIR / "cpu.cfs_period_us").read_text().strip()
+        except OSError:
+            return None
+    try:
+        quota, period = int(quota), int(period)
+    except ValueError:
+        return None
+    if quota <= 0 or period <= 0:
+        return None
+    return max(1, math.ceil(quota / period))
+
+
+def available_cpus():
+    """
+    CPUs this process can actually use: the cores it may be scheduled on,
+    capped by the pod's CPU limit. A Kubernetes limit is a CFS quota, which
+    neither os.cpu_count() nor the affinity mask reflects.
+    """
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = cgroup_cpu_quota()
+    return min(cpus, quota) if quota else cpus
@@ -0,0 +1,58 @@
+import os
+from pathlib import Path
+
+
+def claim_marker(path):
+    """
+    Create path exclusively. Returns True for the single caller that created
+    it, across every worker sharing the volume, and False for everyone else,
+    including callers that find the directory already removed by the winner.
+    """
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except (FileExistsError, FileNotFoundError):
+        return False
+    os.close(fd)
+    return True
+
+
+class FileBarrier:
+    """
+    Fan-in point for work split across workers, kept as marker files on the
+    shared artifacts volume since there is no Celery result backend to build a
+    chord on.
+
+    Each part records its final outcome once (done or failed; a retried part
+    arrives again after its last attempt). The arrival that completes the set
+    claims a release marker, so exactly one worker is told to run the join
+    even when parts finish at the same moment or a task is redelivered. The
+    worker running the join may remove the root; callers still arriving then
+    are simply not the one to release.
+    """
+
+    def __init__(self, root, parts):
+        self.root = Path(root)
+        self.parts = parts
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def arrive(self, part, ok=True):
+        """Record part's outcome; True when this caller should run the join."""
+        status, other = ("done", "failed") if ok else ("failed", "done")
+        try:
+            (self.root / f"{part}.{other}").unlink(missing_ok=True)
+            (self.root / f"{part}.{status}").touch()
+        except FileNotFoundError:
+            # Released and removed already; this is a redelivered part
+            return False
+        if len(self.arrived()) < self.parts:
+            return False
+        return claim_marker(self.root / "released")
+
+    def has_arrived(self, part):
+        return any((self.root / f"{part}.{status}").exists() for status in ("done", "failed"))
+
+    def arrived(self):
+        return {p.stem for p in self.root.glob("*.done")} | set(self.failed())
+
+    def failed(self):
+        return sorted(p.stem for p in self.root.glob("*.failed"))
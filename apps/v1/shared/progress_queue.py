@@ -0,0 +1,6 @@
+# Render progress is only worth anything while it is fresh, and the frontend
+# keeps just the latest event per job, so the queue is capped (oldest events
+# dropped first) and events expire: it can't grow while nobody consumes it.
+# Publisher and consumer must declare the queue with the same arguments.
+RENDER_PROGRESS_QUEUE = "render_progress"
+RENDER_PROGRESS_ARGUMENTS = {"x-max-length": 1000, "x-message-ttl": 60000}
@@ -0,0 +1,30 @@
+import os
+
+RES_HEIGHT = os.getenv("RES_HEIGHT", "360")
+RES_WIDTH = os.getenv("RES_WIDTH", "640")
+FPS = os.getenv("FPS", "30")
+
+# Named quality/speed trade-offs selectable per job. "standard" follows the
+# RES_WIDTH/RES_HEIGHT/FPS settings above.
+RENDER_PROFILES = {
+    "draft": {"preset": "veryfast", "crf": 28, "width": "640", "height": "360", "fps": "15", "audio_bitrate": "96k"},
+    "standard": {"preset": "fast", "crf": 23, "width": RES_WIDTH, "height": RES_HEIGHT, "fps": FPS, "audio_bitrate": "192k"},
+    "archive": {"preset": "slow", "crf": 18, "width": "1920", "height": "1080", "fps": "30", "audio_bitrate": "256k"},
+}
+DEFAULT_RENDER_PROFILE = os.getenv("DEFAULT_RENDER_PROFILE", "standard")
+
+
+def get_render_profile(profile=None):
+    """
+    Settings for a job's render profile. A job's profile is resolved once,
+    where the job is created, and the resolved dict travels with its tasks,
+    so the slide images and the video use the same frame whatever the env of
+    each service. A bare name (older messages, benchmarks) is looked up here.
+    """
+    if isinstance(profile, dict):
+        return dict(profile)
+    name = profile or DEFAULT_RENDER_PROFILE
+    if name not in RENDER_PROFILES:
+        print(f"⚠️ Unknown render profile {name!r}, using {DEFAULT_RENDER_PROFILE}")
+        name = DEFAULT_RENDER_PROFILE
+    return dict(RENDER_PROFILES[name], name=name)
@@ -0,0 +1,23 @@
+"""
+Unit tests for the pieces the services share state through. The services
+import their modules top-level, as laid out in the images, so the same
+directories go on sys.path here. Run from the repository root:
+
+    python -m pytest apps/v1/tests
+
+Tests that import a Celery service module are skipped when celery (and
+aio_pika for the video producer) aren't installed.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+APPS = Path(__file__).resolve().parent.parent
+for service in ("shared", "video-producer", "tts"):
+    sys.path.insert(0, str(APPS / service))
+
+# Service modules create their output directories on import; keep them off /artifacts.
+SCRATCH = Path(tempfile.mkdtemp(prefix="event-poc-tests-"))
+for name in ("VIDEO_OUT_DIR", "TTS_DIR", "STAGES_DIR", "BUMPER_CACHE_DIR", "SEGMENT_CACHE_DIR", "TTS_CACHE_DIR"):
+    os.environ.setdefault(name, str(SCRATCH / name.lower()))
@@ -0,0 +1,57 @@
+import os
+
+from artifact_cache import ArtifactCache, files_digest
+
+
+def put(cache, key, size, mtime):
+    path = cache.temp_path(key)
+    path.write_bytes(b"x" * size)
+    cache.commit(key, path, evict=False)
+    os.utime(cache.path_for(key), (mtime, mtime))
+
+
+def test_lookup_counts_hits_and_misses(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache", 1024)
+    assert cache.lookup("a") is None
+    put(cache, "a", 10, 1000)
+    assert cache.lookup("a") == cache.path_for("a")
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate == 0.5
+
+
+def test_evicts_least_recently_used_past_the_bound(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache", 150)
+    put(cache, "old", 100, 1000)
+    put(cache, "used", 100, 2000)
+    put(cache, "new", 100, 3000)
+    # A hit refreshes the entry, so "used" outlives "new"
+    cache.lookup("used")
+    cache.evict()
+    assert not cache.path_for("old").exists()
+    assert not cache.path_for("new").exists()
+    assert cache.path_for("used").exists()
+
+
+def test_eviction_skips_files_still_being_written(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache", 50)
+    temp = cache.temp_path("pending")
+    temp.write_bytes(b"x" * 100)
+    cache.evict()
+    assert temp.exists()
+
+
+def test_disabled_cache_never_hits_or_stores(tmp_path):
+    cache = ArtifactCache(tmp_path / "cache", 0)
+    source = tmp_path / "clip.mp4"
+    source.write_bytes(b"clip")
+    cache.store("a", source)
+    assert cache.lookup("a") is None
+    assert not (tmp_path / "cache").exists()
+
+
+def test_digest_depends_on_content_and_params(tmp_path):
+    a, b = tmp_path / "a", tmp_path / "b"
+    a.write_bytes(b"same")
+    b.write_bytes(b"same")
+    assert files_digest([a], "crf=23") == files_digest([b], "crf=23")
+    assert files_digest([a], "crf=23") != files_digest([a], "crf=28")
@@ -0,0 +1,73 @@
+import shutil
+import threading
+
+from job_barrier import FileBarrier, claim_marker
+
+
+def test_releases_once_when_every_part_has_arrived(tmp_path):
+    barrier = FileBarrier(tmp_path / "job", 3)
+    assert not barrier.arrive("slide_01")
+    assert not barrier.arrive("slide_02")
+    assert barrier.arrive("slide_03")
+    assert barrier.arrived() == {"slide_01", "slide_02", "slide_03"}
+    # A redelivered part finds the release already claimed
+    assert not barrier.arrive("slide_03")
+
+
+def test_failed_parts_count_towards_release(tmp_path):
+    barrier = FileBarrier(tmp_path / "job", 2)
+    assert not barrier.arrive("audio", ok=False)
+    assert barrier.has_arrived("audio")
+    assert not barrier.has_arrived("slides")
+    assert barrier.arrive("slides")
+    assert barrier.failed() == ["audio"]
+
+
+def test_retried_part_replaces_its_earlier_outcome(tmp_path):
+    barrier = FileBarrier(tmp_path / "job", 2)
+    barrier.arrive("slide_01", ok=False)
+    barrier.arrive("slide_01")
+    assert barrier.failed() == []
+    assert barrier.arrived() == {"slide_01"}
+    barrier.arrive("slide_01", ok=False)
+    assert barrier.failed() == ["slide_01"]
+    assert barrier.arrived() == {"slide_01"}
+
+
+def test_concurrent_arrivals_release_exactly_once(tmp_path):
+    parts = 16
+    barrier = FileBarrier(tmp_path / "job", parts)
+    start = threading.Barrier(parts)
+    released = []
+
+    def arrive(i):
+        start.wait()
+        released.append(barrier.arrive(f"slide_{i:02d}"))
+
+    threads = [threading.Thread(target=arrive, args=(i,)) for i in range(parts)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert released.count(True) == 1
+
+
+def test_claim_after_the_winner_removed_the_barrier(tmp_path):
+    # Both stage sides saw the full set; the winner claimed and cleaned up
+    # before the other side tried to claim.
+    root = tmp_path / "job"
+    slides = FileBarrier(root, 2)
+    audio = FileBarrier(root, 2)
+    slides.arrive("slides")
+    assert audio.arrive("audio")
+    shutil.rmtree(root)
+    assert claim_marker(root / "released") is False
+
+
+def test_arrival_after_the_barrier_was_removed(tmp_path):
+    root = tmp_path / "job"
+    barrier = FileBarrier(root, 1)
+    assert barrier.arrive("audio")
+    shutil.rmtree(root)
+    assert barrier.arrive("audio") is False
+    assert not root.exists()
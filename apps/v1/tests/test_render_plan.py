@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip("celery")
+pytest.importorskip("aio_pika")
+
+import ffmpeg_service  # noqa: E402
+from artifact_cache import ArtifactCache, link_or_copy  # noqa: E402
+from render_profiles import get_render_profile  # noqa: E402
+
+
+@pytest.fixture
+def deck(tmp_path):
+    """Four slides; the third repeats the first's image and audio."""
+    slides = []
+    for idx, content in enumerate([b"intro", b"body", b"intro", b"outro"]):
+        image = tmp_path / f"slide_{idx:02d}.png"
+        audio = tmp_path / f"slide_{idx:02d}.wav"
+        image.write_bytes(b"image " + content)
+        audio.write_bytes(b"audio " + content)
+        slides.append((idx, image, audio, tmp_path / f"segment_{idx:03d}.mp4"))
+    return slides
+
+
+def test_plan_renders_each_distinct_slide_once(tmp_path, deck):
+    cache = ArtifactCache(tmp_path / "cache", 1024 * 1024)
+    renders, reused, duplicates = ffmpeg_service.plan_segment_renders(deck, cache, get_render_profile("standard"))
+    assert [job[0] for job in renders] == [0, 1, 3]
+    assert reused == {}
+    assert duplicates == {2: 0}
+
+
+def test_plan_reuses_segments_cached_by_an_earlier_job(tmp_path, deck):
+    profile = get_render_profile("standard")
+    cache = ArtifactCache(tmp_path / "cache", 1024 * 1024)
+    rendered = tmp_path / "rendered.mp4"
+    rendered.write_bytes(b"segment")
+    cache.store(ffmpeg_service.segment_key(deck[1][1], deck[1][2], profile), rendered)
+
+    renders, reused, duplicates = ffmpeg_service.plan_segment_renders(deck, cache, profile)
+    assert [job[0] for job in renders] == [0, 3]
+    assert list(reused) == [1]
+    assert duplicates == {2: 0}
+
+
+def test_cached_segments_are_not_shared_across_profiles(tmp_path, deck):
+    cache = ArtifactCache(tmp_path / "cache", 1024 * 1024)
+    _, image, audio, segment = deck[0]
+    segment.write_bytes(b"segment")
+    link_or_copy(segment, cache.path_for(ffmpeg_service.segment_key(image, audio, get_render_profile("draft"))))
+
+    renders, reused, _ = ffmpeg_service.plan_segment_renders(deck[:1], cache, get_render_profile("archive"))
+    assert [job[0] for job in renders] == [0]
+    assert reused == {}
+
+
+def test_segment_key_and_gop_follow_the_encode_mode(deck):
+    profile = get_render_profile("standard")
+    _, image, audio, _ = deck[0]
+    assert "-g" in ffmpeg_service.gop_args(profile, "still")
+    assert "-g" not in ffmpeg_service.gop_args(profile, "standard")
+    assert (ffmpeg_service.segment_key(image, audio, profile, "still")
+            != ffmpeg_service.segment_key(image, audio, profile, "standard"))
@@ -0,0 +1,48 @@
+import wave
+
+import pytest
+
+pytest.importorskip("celery")
+
+import tts_processor  # noqa: E402
+
+
+def write_wav(path, frames, rate=16000):
+    with wave.open(str(path), "wb") as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(rate)
+        out.writeframes(b"\1\0" * frames)
+
+
+def test_split_sentences_packs_whole_sentences_up_to_the_limit():
+    text = "One two. Three four! Five six? Seven."
+    assert tts_processor.split_sentences(text, 20) == ["One two. Three four!", "Five six? Seven."]
+
+
+def test_split_sentences_keeps_a_long_sentence_whole():
+    sentence = "This single sentence is longer than the limit."
+    assert tts_processor.split_sentences(f"{sentence} Short.", 10) == [sentence, "Short."]
+
+
+def test_split_sentences_ignores_blank_text():
+    assert tts_processor.split_sentences("   \n ", 100) == []
+
+
+def test_stitch_wavs_inserts_the_gap_between_chunks(tmp_path):
+    first, second = tmp_path / "a.wav", tmp_path / "b.wav"
+    write_wav(first, 1600)
+    write_wav(second, 800)
+    output = tmp_path / "out.wav"
+    tts_processor.stitch_wavs([first, second], output, gap_ms=100)
+    with wave.open(str(output), "rb") as stitched:
+        assert stitched.getframerate() == 16000
+        assert stitched.getnframes() == 1600 + 1600 + 800
+
+
+def test_stitch_wavs_rejects_mismatched_chunks(tmp_path):
+    first, second = tmp_path / "a.wav", tmp_path / "b.wav"
+    write_wav(first, 100, rate=16000)
+    write_wav(second, 100, rate=22050)
+    with pytest.raises(RuntimeError):
+        tts_processor.stitch_wavs([first, second], tmp_path / "out.wav", gap_ms=0)
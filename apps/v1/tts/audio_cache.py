@@ -0,0 +1,9 @@
+import hashlib
+
+
+def audio_key(text, *params):
+    """sha256 over whitespace-normalized text plus the settings that shape the audio."""
+    h = hashlib.sha256(" ".join(text.split()).encode("utf-8"))
+    for param in params:
+        h.update(b"\0" + str(param).encode())
+    return h.hexdigest()
@@ -0,0 +1,67 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+
+class SynthesizerPool:
+    """
+    Worker-level pool of pre-connected Azure SpeechSynthesizers, keyed by
+    voice and output format, reused across slides and across tasks.
+
+    Synthesizers are built with audio_config=None, so each result comes back
+    in memory (result.audio_data) instead of through a file-bound synthesizer,
+    and the service connection is opened up front so only the first request
+    per synthesizer pays for the handshake. A synthesizer is checked out by
+    one caller at a time; one that raised is closed and dropped rather than
+    returned, since its connection may be broken. At most max_idle
+    synthesizers per key are kept between uses.
+    """
+
+    def __init__(self, speechsdk, subscription, region, max_idle=4):
+        self.speechsdk = speechsdk
+        self.subscription = subscription
+        self.region = region
+        self.max_idle = max_idle
+        self.created = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _idle_queue(self, key):
+        with self._lock:
+            return self._idle.setdefault(key, queue.LifoQueue(maxsize=self.max_idle))
+
+    def _create(self, voice, output_format):
+        speech_config = self.speechsdk.SpeechConfig(subscription=self.subscription, region=self.region)
+        speech_config.speech_synthesis_voice_name = voice
+        speech_config.set_speech_synthesis_output_format(output_format)
+        synthesizer = self.speechsdk.SpeechSynthesizer(speech_config=speech_config, audio_config=None)
+        connection = self.speechsdk.Connection.from_speech_synthesizer(synthesizer)
+        connection.open(True)
+        with self._lock:
+            self.created += 1
+        print(f"[INFO] Opened Azure synthesizer connection for {voice}")
+        # The connection has to stay referenced for as long as the synthesizer is pooled.
+        return synthesizer, connection
+
+    def prewarm(self, voice, output_format, count=1):
+        idle = self._idle_queue((voice, output_format))
+        for _ in range(min(count, self.max_idle) - idle.qsize()):
+            idle.put_nowait(self._create(voice, output_format))
+
+    @contextmanager
+    def synthesizer(self, voice, output_format):
+        idle = self._idle_queue((voice, output_format))
+        try:
+            entry = idle.get_nowait()
+        except queue.Empty:
+            entry = self._create(voice, output_format)
+        try:
+            yield entry[0]
+        except BaseException:
+            # Dropped, not pooled: close its connection rather than leak it
+            entry[1].close()
+            raise
+        try:
+            idle.put_nowait(entry)
+        except queue.Full:
+            entry[1].close()
@@ -0,0 +1,122 @@
+"""
+TTS stage benchmark.
+
+Writes a synthetic set of speaker notes and runs `synthesize` on it in
+process (whole-deck dispatch, no broker), once per concurrency level and
+repeat. Reports per-slide latency percentiles, slides/sec, CPU-seconds of
+this process and its children (Piper, ffmpeg), and narration cache hits.
+The audio cache starts empty for every concurrency level, so with
+--repeats 2 the second run shows warm-cache numbers; pass --no-cache to
+measure synthesis alone.
+
+The default engine is the local fake (FAKE_TTS_MS_PER_CHAR / FAKE_TTS_BASE_MS),
+so no network or voice models are needed.
+
+    python bench_tts.py --slides 40 --chars 400 --in-flight 1 4 8
+    python bench_tts.py --engine piper --voice en_US-amy-medium --repeats 2
+"""
+import argparse
+import os
+import random
+import resource
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Keep the service module off /artifacts and the broker when imported here.
+_workdir = Path(tempfile.mkdtemp(prefix="bench-tts-"))
+os.environ.setdefault("TTS_DIR", str(_workdir / "tts_output"))
+os.environ.setdefault("TTS_CACHE_DIR", str(_workdir / "cache"))
+os.environ["TTS_DISPATCH"] = "job"
+
+import tts_processor  # noqa: E402
+
+WORDS = ("slide quarterly revenue growth customer platform latency model region team roadmap "
+         "release metric pipeline forecast feedback launch market budget design review").split()
+
+
+def cpu_seconds():
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def build_notes(notes_dir: Path, slides: int, chars: int, seed: int):
+    notes_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    for i in range(1, slides + 1):
+        target = max(20, int(rng.gauss(chars, chars / 4)))
+        sentences, length = [], 0
+        while length < target:
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16))).capitalize() + "."
+            sentences.append(sentence)
+            length += len(sentence) + 1
+        (notes_dir / f"slide_{i:02d}.txt").write_text(" ".join(sentences), encoding="utf-8")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, int(round(pct / 100 * len(ordered))) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slides", type=int, default=40)
+    parser.add_argument("--chars", type=int, default=400, help="mean characters of notes per slide")
+    parser.add_argument("--engine", default="fake", choices=sorted(tts_processor.ENGINES))
+    parser.add_argument("--voice", default="en-US-JennyNeural")
+    parser.add_argument("--piper-args", type=float, nargs=3, default=[1.0, 0.667, 0.8])
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--repeats", type=int, default=1, help="runs per concurrency level")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    notes_dir = _workdir / "notes"
+    print(f"Writing {args.slides} synthetic notes to {notes_dir} ...")
+    build_notes(notes_dir, args.slides, args.chars, args.seed)
+
+    # Time every slide, and keep the finished deck from being sent to the video producer.
+    latencies = []
+    lock = threading.Lock()
+    synthesize_slide = tts_processor.synthesize_slide
+
+    def timed_slide(*slide_args):
+        start = time.perf_counter()
+        result = synthesize_slide(*slide_args)
+        with lock:
+            latencies.append(time.perf_counter() - start)
+        return result
+
+    tts_processor.synthesize_slide = timed_slide
+    tts_processor.start_video = lambda *start_args: None
+    if args.no_cache:
+        tts_processor.AUDIO_CACHE_MAX_BYTES = 0
+
+    print(f"{'in-flight':>9} {'run':>4} {'wall s':>8} {'slides/s':>9} {'p50 s':>7} {'p95 s':>7} "
+          f"{'p99 s':>7} {'cpu s':>7}")
+    for in_flight in args.in_flight:
+        tts_processor.TTS_MAX_IN_FLIGHT = in_flight
+        tts_processor.in_flight = threading.BoundedSemaphore(in_flight)
+        shutil.rmtree(tts_processor.AUDIO_CACHE_DIR, ignore_errors=True)
+        for run in range(1, args.repeats + 1):
+            latencies.clear()
+            job_id = f"bench-{args.engine}-{in_flight}-{run}"
+            cpu_start = cpu_seconds()
+            start = time.perf_counter()
+            tts_processor.synthesize(str(notes_dir), job_id, args.voice, args.engine, args.piper_args,
+                                     job_id, "standard")
+            wall = time.perf_counter() - start
+            cpu = cpu_seconds() - cpu_start
+            print(f"{in_flight:>9} {run:>4} {wall:>8.2f} {len(latencies) / wall:>9.2f} "
+                  f"{statistics.median(latencies):>7.3f} {percentile(latencies, 95):>7.3f} "
+                  f"{percentile(latencies, 99):>7.3f} {cpu:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
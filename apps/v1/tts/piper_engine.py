@@ -0,0 +1,77 @@
+import threading
+import wave
+from collections import OrderedDict
+from pathlib import Path
+
+try:
+    from piper.voice import PiperVoice
+except ImportError:
+    PiperVoice = None
+
+
+class _LoadedVoice:
+    def __init__(self, voice):
+        self.voice = voice
+        # espeak-ng phonemization inside piper is not thread-safe; onnxruntime
+        # already spreads a single synthesis across the cores.
+        self.lock = threading.Lock()
+
+
+class PiperEngine:
+    """
+    In-process Piper synthesis with voice models kept loaded per worker.
+
+    Models are loaded from model_dir/<voice>.onnx on first use and held in an
+    LRU of max_voices entries, so consecutive slides and tasks with the same
+    voice skip the model load that a fresh `piper` process pays every time.
+    length_scale / noise_scale / noise_w are applied per request. Audio can be
+    written as a WAV file or streamed as raw 16-bit mono PCM.
+    """
+
+    def __init__(self, model_dir, max_voices=2):
+        self.model_dir = Path(model_dir)
+        self.max_voices = max_voices
+        self._voices = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        return PiperVoice is not None
+
+    def _voice(self, name):
+        with self._lock:
+            if name in self._voices:
+                self._voices.move_to_end(name)
+                return self._voices[name]
+            model = self.model_dir / f"{name}.onnx"
+            print(f"[INFO] Loading Piper voice {model}")
+            loaded = _LoadedVoice(PiperVoice.load(str(model), config_path=f"{model}.json"))
+            self._voices[name] = loaded
+            while len(self._voices) > self.max_voices:
+                evicted, _ = self._voices.popitem(last=False)
+                print(f"[INFO] Unloaded Piper voice {evicted}")
+            return loaded
+
+    def synthesize(self, text, voice, wav_path, length_scale, noise_scale, noise_w):
+        loaded = self._voice(voice)
+        with loaded.lock, wave.open(str(wav_path), "wb") as wav_file:
+            loaded.voice.synthesize(
+                text, wav_file,
+                length_scale=length_scale,
+                noise_scale=noise_scale,
+                noise_w=noise_w
+            )
+
+    def sample_rate(self, voice):
+        return self._voice(voice).voice.config.sample_rate
+
+    def stream_raw(self, text, voice, length_scale, noise_scale, noise_w):
+        """Yield raw 16-bit mono PCM at sample_rate(voice), sentence by sentence."""
+        loaded = self._voice(voice)
+        with loaded.lock:
+            yield from loaded.voice.synthesize_stream_raw(
+                text,
+                length_scale=length_scale,
+                noise_scale=noise_scale,
+                noise_w=noise_w
+            )
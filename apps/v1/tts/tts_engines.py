@@ -0,0 +1,224 @@
+import array
+import json
+import math
+import subprocess
+import tempfile
+import time
+import wave
+import zlib
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+
+def pcm_encoder(sample_rate, output_file, stdin=subprocess.PIPE):
+    """ffmpeg reading raw 16-bit mono PCM on stdin and writing output_file."""
+    output_file = Path(output_file)
+    codec = ["-c:a", "flac"] if output_file.suffix == ".flac" else []
+    return subprocess.Popen([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+        *codec, str(output_file)
+    ], stdin=stdin, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+class TTSEngine(ABC):
+    """
+    A speech backend for tts_processor.
+
+    synthesize_wav writes 16-bit PCM WAV, which chunking and format
+    conversion build on. synthesize_file may write the final audio file
+    directly when the engine can produce it without a WAV on disk, and
+    returns False when it can't. cache_params lists what besides the text
+    and voice shapes the audio, for the narration cache key.
+    """
+
+    name = None
+
+    def cache_params(self, piper_args):
+        return ()
+
+    def max_concurrency(self):
+        """Upper bound on concurrent requests in one process, or None."""
+        return None
+
+    @abstractmethod
+    def synthesize_wav(self, text, label, wav_path, voice, piper_args):
+        ...
+
+    def synthesize_file(self, text, label, output_file, voice, piper_args):
+        return False
+
+
+class AzureTTS(TTSEngine):
+    name = "azure"
+
+    def __init__(self, speechsdk, pool, audio_format):
+        self.speechsdk = speechsdk
+        self.pool = pool
+        self.audio_format = audio_format
+
+    def output_format(self):
+        # Lossless formats come back as 48 kHz PCM in a RIFF container
+        if self.audio_format == "mp3":
+            return self.speechsdk.SpeechSynthesisOutputFormat.Audio48Khz192KBitRateMonoMp3
+        return self.speechsdk.SpeechSynthesisOutputFormat.Riff48Khz16BitMonoPcm
+
+    def _require_sdk(self):
+        if not self.speechsdk:
+            raise ImportError("azure.cognitiveservices.speech not installed.")
+
+    def _synthesize(self, text, label, output_path, voice, output_format):
+        with self.pool.synthesizer(voice, output_format) as synthesizer:
+            result = synthesizer.speak_text_async(text).get()
+            if result.reason == self.speechsdk.ResultReason.Canceled:
+                cancellation = result.cancellation_details
+                print(f"[ERROR] Cancelled: {cancellation.reason} - {cancellation.error_details}")
+                raise RuntimeError(f"TTS failed for {label}")
+
+        if result.reason != self.speechsdk.ResultReason.SynthesizingAudioCompleted:
+            raise RuntimeError(f"TTS returned {result.reason} for {label}")
+        # The whole clip arrives in memory, so it lands on disk in one write
+        Path(output_path).write_bytes(result.audio_data)
+
+    def synthesize_wav(self, text, label, wav_path, voice, piper_args):
+        self._require_sdk()
+        self._synthesize(text, label, wav_path, voice,
+                         self.speechsdk.SpeechSynthesisOutputFormat.Riff48Khz16BitMonoPcm)
+
+    def synthesize_file(self, text, label, output_file, voice, piper_args):
+        if self.audio_format != "mp3":
+            return False
+        self._require_sdk()
+        self._synthesize(text, label, output_file, voice, self.output_format())
+        return True
+
+
+class PiperTTS(TTSEngine):
+    """
+    Piper through the in-process engine (voices kept loaded), falling back to
+    the piper binary. Final files are encoded from a raw PCM stream, so no
+    intermediate WAV touches the shared volume.
+    """
+
+    name = "piper"
+
+    def __init__(self, engine, binary, model_dir, mode, cpus):
+        self.engine = engine
+        self.binary = binary
+        self.model_dir = model_dir
+        self.mode = mode
+        self.cpus = cpus
+
+    def cache_params(self, piper_args):
+        return tuple(piper_args[:3])
+
+    def max_concurrency(self):
+        return self.cpus
+
+    def _use_bindings(self):
+        return self.mode == "bindings" and self.engine.available
+
+    def _command(self, voice, output_args, piper_args):
+        piper_cmd = [
+            self.binary,
+            "--model", self.model_dir+"/"+voice+".onnx",
+            *output_args,
+            "--length_scale", str(piper_args[0]),        # speed of speech; higher=slower
+            "--noise_scale", str(piper_args[1]),       # speech pattern variation; lower=flatter
+            "--noise_w", str(piper_args[2])            # duration/affects timing and rhythm
+        ]
+        print(f"[DEBUG] Running Piper: {' '.join(piper_cmd)}")
+        return piper_cmd
+
+    def _sample_rate(self, voice):
+        with open(f"{self.model_dir}/{voice}.onnx.json", "r", encoding="utf-8") as f:
+            return int(json.load(f)["audio"]["sample_rate"])
+
+    def synthesize_wav(self, text, label, wav_path, voice, piper_args):
+        print(f"Running Piper with length scale {piper_args[0]}, noise scale {piper_args[1]}, and phoneme variability parameter {piper_args[2]}")
+        if self._use_bindings():
+            try:
+                self.engine.synthesize(text, voice, wav_path, *piper_args[:3])
+                return
+            except Exception as e:
+                print(f"[WARN] Piper bindings failed for {label} ({e}), falling back to {self.binary}")
+        proc = subprocess.run(
+            self._command(voice, ["--output_file", str(wav_path)], piper_args),
+            input=text.encode("utf-8"),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        if proc.returncode != 0:
+            print(proc.stderr.decode())
+            raise RuntimeError(f"Piper TTS failed for {label}")
+
+    def synthesize_file(self, text, label, output_file, voice, piper_args):
+        print(f"Running Piper with length scale {piper_args[0]}, noise scale {piper_args[1]}, and phoneme variability parameter {piper_args[2]}")
+        if self._use_bindings():
+            try:
+                encoder = pcm_encoder(self.engine.sample_rate(voice), output_file)
+                try:
+                    for pcm in self.engine.stream_raw(text, voice, *piper_args[:3]):
+                        encoder.stdin.write(pcm)
+                finally:
+                    encoder_err = encoder.communicate()[1]
+                if encoder.returncode != 0:
+                    print(encoder_err.decode(errors="replace"))
+                    raise RuntimeError(f"Encoding Piper audio failed for {label}")
+                return True
+            except Exception as e:
+                print(f"[WARN] Piper bindings failed for {label} ({e}), falling back to {self.binary}")
+
+        # Piper logs every sentence; keep that off a pipe nobody drains until the end
+        with tempfile.TemporaryFile() as piper_log:
+            piper = subprocess.Popen(self._command(voice, ["--output_raw"], piper_args),
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=piper_log)
+            encoder = pcm_encoder(self._sample_rate(voice), output_file, stdin=piper.stdout)
+            piper.stdout.close()
+            piper.stdin.write(text.encode("utf-8"))
+            piper.stdin.close()
+            encoder_err = encoder.communicate()[1]
+            piper.wait()
+            if piper.returncode != 0:
+                piper_log.seek(0)
+                print(piper_log.read().decode(errors="replace"))
+                raise RuntimeError(f"Piper TTS failed for {label}")
+        if encoder.returncode != 0:
+            print(encoder_err.decode(errors="replace"))
+            raise RuntimeError(f"Encoding Piper audio failed for {label}")
+        return True
+
+
+class FakeTTS(TTSEngine):
+    """
+    Deterministic local engine for benchmarks and offline runs. Sleeps
+    base_ms + ms_per_char per character to stand in for service latency and
+    writes a sine tone whose pitch comes from the text and whose length
+    follows a speaking rate of seconds_per_char.
+    """
+
+    name = "fake"
+
+    def __init__(self, ms_per_char=1.0, base_ms=50.0, seconds_per_char=0.06, sample_rate=22050):
+        self.ms_per_char = ms_per_char
+        self.base_ms = base_ms
+        self.seconds_per_char = seconds_per_char
+        self.sample_rate = sample_rate
+
+    def pcm(self, text):
+        frequency = 200 + zlib.crc32(text.encode("utf-8")) % 400
+        period = array.array("h", (
+            int(8000 * math.sin(2 * math.pi * i / (self.sample_rate / frequency)))
+            for i in range(int(self.sample_rate / frequency))
+        ))
+        frames = int(len(text) * self.seconds_per_char * self.sample_rate)
+        samples = period * (frames // len(period) + 1)
+        return samples[:frames].tobytes()
+
+    def synthesize_wav(self, text, label, wav_path, voice, piper_args):
+        time.sleep((self.base_ms + self.ms_per_char * len(text)) / 1000)
+        with wave.open(str(wav_path), "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(self.pcm(text))
@@ -1,6 +1,15 @@
 import os
 from pathlib import Path
 from celery import Celery
+from celery.signals import worker_process_init
+from azure_pool import SynthesizerPool
+from piper_engine import PiperEngine
+from artifact_cache import ArtifactCache, link_or_copy
+from cpu_limits import available_cpus
+from audio_cache import audio_key
+from job_barrier import FileBarrier
+from tts_engines import AzureTTS, FakeTTS, PiperTTS, TTSEngine
+import shutil
 
 # Import Azure if available
 try:
@@ -8,13 +17,12 @@ try:
 except ImportError:
     speechsdk = None
 
-# Try importing Piper (if you want to use the Python bindings, though subprocess is more common)
-try:
-    import piper
-except ImportError:
-    piper = None
-
+import re
 import subprocess
+import tempfile
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
 
 # Environment-based configuration
 RABBITMQ_HOST = os.environ.get("RABBITMQ_HOST", "rabbitmq")
@@ -25,6 +33,28 @@ RABBITMQ_VHOST = os.environ.get("RABBITMQ_VHOST", "/")
 SPEECH_KEY = os.environ.get("SPEECH_KEY", "")
 SPEECH_REGION = os.environ.get("SPEECH_REGION", "canadacentral")
 
+# Pre-connected Azure synthesizers kept per worker process and voice, and
+# voices to connect when the worker process starts (comma-separated).
+AZURE_POOL_SIZE = int(os.environ.get("AZURE_POOL_SIZE", "4"))
+AZURE_PREWARM_VOICES = [v for v in os.environ.get("AZURE_PREWARM_VOICES", "").split(",") if v]
+
+# Slides synthesized concurrently within one job. Keeps Azure under its
+# concurrent-request limit; Piper is additionally capped at the core count.
+TTS_MAX_IN_FLIGHT = int(os.environ.get("TTS_MAX_IN_FLIGHT", "4"))
+# Notes longer than TTS_CHUNK_CHARS are split at sentence boundaries,
+# synthesized concurrently and stitched with TTS_CHUNK_GAP_MS of silence
+# between chunks; 0 sends every slide as a single request.
+TTS_CHUNK_CHARS = int(os.environ.get("TTS_CHUNK_CHARS", "600"))
+TTS_CHUNK_GAP_MS = int(os.environ.get("TTS_CHUNK_GAP_MS", "150"))
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+# "per-slide" queues one synthesize_slide_task per slide on tts_tasks, each
+# retried on its own, and the last slide to finish starts the video stage;
+# "job" synthesizes the whole deck inside synthesize.
+TTS_DISPATCH = os.environ.get("TTS_DISPATCH", "job").lower()
+TTS_MAX_RETRIES = int(os.environ.get("TTS_MAX_RETRIES", "3"))
+TTS_RETRY_DELAY = int(os.environ.get("TTS_RETRY_DELAY", "5"))
+
 # New: TTS engine selection
 TTS_ENGINE = os.environ.get("TTS_ENGINE", "azure").lower()
 
@@ -32,10 +62,32 @@ TTS_ENGINE = os.environ.get("TTS_ENGINE", "azure").lower()
 PIPER_BINARY = os.environ.get("PIPER_BINARY", "/usr/local/bin/piper")
 #PIPER_MODEL = os.environ.get("PIPER_MODEL", "/models/en_US-amy-low.onnx")
 #PIPER_SPEAKER = os.environ.get("PIPER_SPEAKER", "")
+PIPER_MODEL_DIR = os.environ.get("PIPER_MODEL_DIR", "/models")
+# "bindings" keeps voices loaded in the worker via piper-tts (falling back to
+# the binary if that fails); "subprocess" runs PIPER_BINARY per slide.
+PIPER_MODE = os.environ.get("PIPER_MODE", "bindings").lower()
+PIPER_MAX_VOICES = int(os.environ.get("PIPER_MAX_VOICES", "2"))
+# Local stand-in engine (TTS_ENGINE=fake) for benchmarks and offline runs.
+FAKE_TTS_MS_PER_CHAR = float(os.environ.get("FAKE_TTS_MS_PER_CHAR", "1"))
+FAKE_TTS_BASE_MS = float(os.environ.get("FAKE_TTS_BASE_MS", "50"))
+
+# Narration file format. "wav" (PCM) and "flac" stay lossless so the video
+# producer encodes AAC exactly once; "mp3" is the original compressed output.
+AUDIO_FORMAT = os.environ.get("AUDIO_FORMAT", "mp3").lower()
+if AUDIO_FORMAT not in ("mp3", "wav", "flac"):
+    raise ValueError(f"Unknown AUDIO_FORMAT: {AUDIO_FORMAT}")
 
 OUTPUT_DIR = Path(os.getenv("TTS_DIR", "/artifacts/tts_output/"))
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Synthesized narration shared across jobs, keyed by normalized text + voice settings.
+AUDIO_CACHE_DIR = Path(os.getenv("TTS_CACHE_DIR", "/artifacts/cache/tts/"))
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+# Joins the extractor's slide images with this service's audio when the
+# extractor runs the two concurrently; shared with the pptx extractor.
+STAGES_DIR = Path(os.getenv("STAGES_DIR", "/artifacts/stages/"))
+
 CELERY_BROKER_URL = (
     f"amqp://{RABBITMQ_USER}:{RABBITMQ_PASS}@{RABBITMQ_HOST}:{RABBITMQ_PORT}{RABBITMQ_VHOST}"
 )
@@ -44,87 +96,192 @@ celery_app = Celery(
     'tts_processor',
     broker=CELERY_BROKER_URL
 )
+# One task at a time per worker process, so per-slide tasks spread across replicas.
+celery_app.conf.worker_prefetch_multiplier = 1
 
-@celery_app.task(queue='tts_tasks', name='tts_processor.synthesize')
-def synthesize(input_dir: str, job_id: str, voice: str, tts_engine: str, piper_args: list[float], file_id: str) -> str:
-    input_path = Path(input_dir)
-    if not input_path.exists() or not input_path.is_dir():
-        raise ValueError(f"{input_dir} is not a valid directory")
+# Built lazily per worker process; connections can't be shared across a fork.
+azure_pool = SynthesizerPool(speechsdk, SPEECH_KEY, SPEECH_REGION, AZURE_POOL_SIZE) if speechsdk else None
 
-    audio_files = []
-    OUTPUT_JOB_DIR = OUTPUT_DIR / job_id
-    OUTPUT_JOB_DIR.mkdir(parents=True, exist_ok=True)
+piper_engine = PiperEngine(PIPER_MODEL_DIR, PIPER_MAX_VOICES)
+# Engine requests in flight per worker process, across slides and chunks.
+in_flight = threading.BoundedSemaphore(TTS_MAX_IN_FLIGHT)
 
-    for text_file in sorted(input_path.glob("*.txt")):
-        filename = text_file.stem
-        with open(text_file, "r", encoding="utf-8") as f:
-            text = f.read().strip()
-            if not text:
-                continue
-        output_file = OUTPUT_JOB_DIR / f"{filename}.mp3"
-        print(f"[DEBUG] Processing: {text_file}")
-        print(f"[DEBUG] Saving to: {output_file}")
+ENGINES = {
+    "azure": AzureTTS(speechsdk, azure_pool, AUDIO_FORMAT),
+    "piper": PiperTTS(piper_engine, PIPER_BINARY, PIPER_MODEL_DIR, PIPER_MODE, available_cpus()),
+    "fake": FakeTTS(FAKE_TTS_MS_PER_CHAR, FAKE_TTS_BASE_MS),
+}
 
-        try:
-            if not os.access(OUTPUT_JOB_DIR, os.W_OK):
-                raise PermissionError(f"Cannot write to output directory: {OUTPUT_JOB_DIR}")
-            if tts_engine == "azure":
-                # --- Azure TTS ---
-                if not speechsdk:
-                    raise ImportError("azure.cognitiveservices.speech not installed.")
-                speech_config = speechsdk.SpeechConfig(subscription=SPEECH_KEY, region=SPEECH_REGION)
-                speech_config.speech_synthesis_voice_name = voice
-                speech_config.set_speech_synthesis_output_format(
-                    speechsdk.SpeechSynthesisOutputFormat.Audio48Khz192KBitRateMonoMp3
-                )
-                audio_config = speechsdk.audio.AudioOutputConfig(filename=str(output_file))
-                synthesizer = speechsdk.SpeechSynthesizer(speech_config, audio_config)
-                result = synthesizer.speak_text_async(text).get()
-
-                if result.reason == speechsdk.ResultReason.SynthesizingAudioCompleted:
-                    audio_files.append(str(output_file))
-                elif result.reason == speechsdk.ResultReason.Canceled:
-                    cancellation = result.cancellation_details
-                    print(f"[ERROR] Cancelled: {cancellation.reason} - {cancellation.error_details}")
-                    raise RuntimeError(f"TTS failed for {filename}")
-            elif tts_engine == "piper":
-                # --- Piper TTS via subprocess ---
-                # Piper needs WAV output by default, so we'll generate a WAV and convert to MP3 if needed
-                output_wav = OUTPUT_JOB_DIR / f"{filename}.wav"
-                print(f"Running Piper with length scale {piper_args[0]}, noise scale {piper_args[1]}, and phoneme variability parameter {piper_args[2]}") 
-                piper_cmd = [
-                    PIPER_BINARY,
-                    "--model", "/models/"+voice+".onnx",
-                    "--output_file", str(output_wav),
-                    "--length_scale", str(piper_args[0]),        # speed of speech; higher=slower
-                    "--noise_scale", str(piper_args[1]),       # speech pattern variation; lower=flatter
-                    "--noise_w", str(piper_args[2])            # duration/affects timing and rhythm
-                ]
-                print(f"[DEBUG] Running Piper: {' '.join(piper_cmd)}")
-
-                proc = subprocess.run(
-                    piper_cmd,
-                    input=text.encode("utf-8"),
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE
-                )
-                if proc.returncode != 0:
-                    print(proc.stderr.decode())
-                    raise RuntimeError(f"Piper TTS failed for {filename}")
-                # Convert WAV to MP3
-                subprocess.run([
-                    "ffmpeg", "-y", "-i", str(output_wav), str(output_file)
-                ], check=True)
-                os.remove(output_wav)
-                audio_files.append(str(output_file))
-            else:
-                raise ValueError(f"Unknown TTS_ENGINE: {TTS_ENGINE}")
+def get_engine(name: str) -> TTSEngine:
+    if name not in ENGINES:
+        raise ValueError(f"Unknown TTS_ENGINE: {name}")
+    return ENGINES[name]
 
+@worker_process_init.connect
+def prewarm_azure(**kwargs):
+    if not azure_pool:
+        return
+    for voice in AZURE_PREWARM_VOICES:
+        try:
+            azure_pool.prewarm(voice, ENGINES["azure"].output_format())
         except Exception as e:
-            print(f"[ERROR] failed to synthesize {text_file.name}: {e}")
+            print(f"[WARN] Could not pre-connect Azure voice {voice}: {e}")
+
+def encode_audio(wav_path: Path, output_file: Path):
+    """Store a synthesized WAV as output_file (AUDIO_FORMAT), removing the WAV."""
+    if wav_path == output_file:
+        return
+    codec = ["-c:a", "flac"] if output_file.suffix == ".flac" else []
+    subprocess.run([
+        "ffmpeg", "-y", "-i", str(wav_path), *codec, str(output_file)
+    ], check=True)
+    os.remove(wav_path)
+
+
+def synthesize_slide(text_file: Path, output_job_dir: Path, voice: str, tts_engine: str, piper_args: list[float],
+                     cache: ArtifactCache):
+    """Synthesize one slide's notes. Returns the audio path, or None for empty notes."""
+    filename = text_file.stem
+    with open(text_file, "r", encoding="utf-8") as f:
+        text = f.read().strip()
+        if not text:
+            return None
+    output_file = output_job_dir / f"{filename}.{AUDIO_FORMAT}"
+    print(f"[DEBUG] Processing: {text_file}")
+    print(f"[DEBUG] Saving to: {output_file}")
+
+    if not os.access(output_job_dir, os.W_OK):
+        raise PermissionError(f"Cannot write to output directory: {output_job_dir}")
+
+    engine = get_engine(tts_engine)
+    # Chunked notes also depend on where they were split and the silence between chunks
+    chunk_params = (TTS_CHUNK_CHARS, TTS_CHUNK_GAP_MS) if len(text_chunks(text)) > 1 else ()
+    key = audio_key(text, tts_engine, voice, AUDIO_FORMAT, *engine.cache_params(piper_args), *chunk_params)
+    with cache.locked(key):
+        cached = cache.lookup(key)
+        if cached is not None:
+            print(f"[INFO] TTS cache hit for {filename}")
+            return link_or_copy(cached, output_file)
+        synthesize_text(text, filename, output_file, voice, engine, piper_args)
+        cache.store(key, output_file)
+    return output_file
+
+
+def synthesize_wav(engine: TTSEngine, text: str, label: str, wav_path: Path, voice: str, piper_args: list[float]):
+    with in_flight:
+        engine.synthesize_wav(text, label, wav_path, voice, piper_args)
+
+def split_sentences(text: str, max_chars: int) -> list[str]:
+    """
+    Split notes at sentence boundaries into chunks of at most max_chars
+    (a single longer sentence stays whole).
+    """
+    chunks, current = [], ""
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def stitch_wavs(wav_paths: list[Path], output_wav: Path, gap_ms: int):
+    """Concatenate PCM WAVs of one voice, with gap_ms of silence between them."""
+    layout = None
+    with wave.open(str(output_wav), "wb") as out:
+        for i, path in enumerate(wav_paths):
+            with wave.open(str(path), "rb") as chunk:
+                chunk_layout = (chunk.getnchannels(), chunk.getsampwidth(), chunk.getframerate())
+                if layout is None:
+                    layout = chunk_layout
+                    out.setnchannels(layout[0])
+                    out.setsampwidth(layout[1])
+                    out.setframerate(layout[2])
+                elif chunk_layout != layout:
+                    raise RuntimeError(f"Chunk {path.name} is {chunk_layout}, expected {layout}")
+                if i > 0:
+                    channels, width, rate = layout
+                    out.writeframes(b"\0" * (rate * gap_ms // 1000) * channels * width)
+                out.writeframes(chunk.readframes(chunk.getnframes()))
 
+
+def synthesize_chunked(chunks: list[str], filename: str, output_wav: Path, scratch: Path, voice: str,
+                       engine: TTSEngine, piper_args: list[float]):
+    """
+    Synthesize sentence chunks of one slide concurrently into scratch WAVs
+    and stitch them, in order, into output_wav.
+    """
+    print(f"[INFO] Splitting notes for {filename} into {len(chunks)} chunks")
+    wav_paths = [scratch / f"chunk_{i:03d}.wav" for i in range(len(chunks))]
+    with ThreadPoolExecutor(max_workers=min(len(chunks), TTS_MAX_IN_FLIGHT), thread_name_prefix="chunk") as pool:
+        futures = [
+            pool.submit(synthesize_wav, engine, chunk, f"{filename} chunk {i}", wav_path, voice, piper_args)
+            for i, (chunk, wav_path) in enumerate(zip(chunks, wav_paths))
+        ]
+        for future in futures:
+            future.result()
+    stitch_wavs(wav_paths, output_wav, TTS_CHUNK_GAP_MS)
+
+def text_chunks(text: str) -> list[str]:
+    return split_sentences(text, TTS_CHUNK_CHARS) if TTS_CHUNK_CHARS > 0 else [text]
+
+def synthesize_text(text: str, filename: str, output_file: Path, voice: str, engine: TTSEngine, piper_args: list[float]):
+    chunks = text_chunks(text)
+    if len(chunks) == 1:
+        # Engines that can write the final format directly skip the WAV step
+        with in_flight:
+            if engine.synthesize_file(text, filename, output_file, voice, piper_args):
+                return output_file
+
+    # Intermediate WAVs stay on local scratch; only the final file goes to the share
+    with tempfile.TemporaryDirectory(prefix=f"tts-{filename}-") as scratch:
+        output_wav = output_file if AUDIO_FORMAT == "wav" else Path(scratch) / f"{filename}.wav"
+        if len(chunks) > 1:
+            synthesize_chunked(chunks, filename, output_wav, Path(scratch), voice, engine, piper_args)
+        else:
+            synthesize_wav(engine, text, filename, output_wav, voice, piper_args)
+        encode_audio(output_wav, output_file)
+    return output_file
+
+def slide_workers(tts_engine: str, slide_count: int) -> int:
+    """Slides synthesized at once: TTS_MAX_IN_FLIGHT, capped by what the engine can run in parallel."""
+    workers = TTS_MAX_IN_FLIGHT
+    engine_limit = get_engine(tts_engine).max_concurrency()
+    if engine_limit:
+        workers = min(workers, engine_limit)
+    return max(1, min(workers, slide_count))
+
+def stage_barrier(job_id: str) -> FileBarrier:
+    return FileBarrier(STAGES_DIR / job_id, 2)
+
+def audio_stage_done(job_id: str, ok: bool = True) -> bool:
+    """
+    Record the audio side of the job's stage barrier. True when the slide
+    images are already done and both stages succeeded, i.e. the caller should
+    start the video. The barrier is removed once both sides have arrived.
+    """
+    barrier = stage_barrier(job_id)
+    if not barrier.arrive("audio", ok):
+        print(f"[INFO] Audio for job {job_id} {'is ready' if ok else 'failed'}, waiting for the slide images")
+        return False
+    failed = barrier.failed()
+    shutil.rmtree(STAGES_DIR / job_id, ignore_errors=True)
+    if failed:
+        print(f"[ERROR] Job {job_id}: {', '.join(failed)} stage failed, not starting the video")
+        return False
+    return True
+
+def start_video(job_id: str, file_id: str, render_profile: str | dict, wait_for_slides: bool = False):
+    if wait_for_slides and not audio_stage_done(job_id):
+        return
     task_name = "ffmpeg_service.produce_video"
-    args = [job_id, file_id]
+    args = [job_id, file_id, render_profile]
     result = celery_app.send_task(
         name=task_name,
         args=args,
@@ -132,4 +289,114 @@ def synthesize(input_dir: str, job_id: str, voice: str, tts_engine: str, piper_a
     )
     result_str = str(result)
     print(f"Task sent from tts_tasks, result: {result_str}")    
+
+def slide_barrier(job_id: str, slide_count: int) -> FileBarrier:
+    # Hidden directory: the video producer only picks up audio files from the job dir
+    return FileBarrier(OUTPUT_DIR / job_id / ".barrier", slide_count)
+
+def log_cache_stats(job_id: str, hits: int, misses: int):
+    lookups = hits + misses
+    print(f"[INFO] TTS cache for job {job_id}: {hits} hit(s), {misses} miss(es) "
+          f"({hits / lookups if lookups else 0.0:.0%} hit rate)")
+
+def record_cache_stats(barrier: FileBarrier, part: str, cache: ArtifactCache):
+    """Leave one slide's cache lookups next to the barrier, for whichever slide releases it."""
+    (barrier.root / f"{part}.cache").write_text(f"{cache.hits} {cache.misses}")
+
+def job_cache_stats(barrier: FileBarrier) -> tuple[int, int]:
+    hits = misses = 0
+    for path in barrier.root.glob("*.cache"):
+        slide_hits, slide_misses = map(int, path.read_text().split())
+        hits += slide_hits
+        misses += slide_misses
+    return hits, misses
+
+@celery_app.task(queue='tts_tasks', name='tts_processor.synthesize')
+def synthesize(input_dir: str, job_id: str, voice: str, tts_engine: str, piper_args: list[float], file_id: str, render_profile: str | dict = "standard",
+               wait_for_slides: bool = False) -> str:
+    try:
+        return synthesize_job(input_dir, job_id, voice, tts_engine, piper_args, file_id, render_profile,
+                              wait_for_slides)
+    except Exception:
+        # Without this the extractor's slides would wait on the barrier forever
+        if wait_for_slides:
+            audio_stage_done(job_id, ok=False)
+        raise
+
+def synthesize_job(input_dir: str, job_id: str, voice: str, tts_engine: str, piper_args: list[float], file_id: str,
+                   render_profile: str | dict, wait_for_slides: bool):
+    input_path = Path(input_dir)
+    if not input_path.exists() or not input_path.is_dir():
+        raise ValueError(f"{input_dir} is not a valid directory")
+
+    audio_files = []
+    OUTPUT_JOB_DIR = OUTPUT_DIR / job_id
+    OUTPUT_JOB_DIR.mkdir(parents=True, exist_ok=True)
+    text_files = sorted(input_path.glob("*.txt"))
+
+    if TTS_DISPATCH == "per-slide" and text_files:
+        shutil.rmtree(OUTPUT_JOB_DIR / ".barrier", ignore_errors=True)
+        for text_file in text_files:
+            synthesize_slide_task.delay(str(text_file), job_id, voice, tts_engine, piper_args, file_id,
+                                        render_profile, len(text_files), wait_for_slides)
+        print(f"[INFO] Queued {len(text_files)} per-slide TTS tasks for job {job_id}")
+        return [str(text_file) for text_file in text_files]
+
+    cache = ArtifactCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES, f".{AUDIO_FORMAT}")
+    workers = slide_workers(tts_engine, len(text_files))
+    print(f"[INFO] Synthesizing {len(text_files)} slides with up to {workers} in flight")
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts") as pool:
+        futures = [
+            pool.submit(synthesize_slide, text_file, OUTPUT_JOB_DIR, voice, tts_engine, piper_args, cache)
+            for text_file in text_files
+        ]
+        # Collect in slide order; one failed slide doesn't stop the rest
+        for text_file, future in zip(text_files, futures):
+            try:
+                output_file = future.result()
+                if output_file:
+                    audio_files.append(str(output_file))
+            except Exception as e:
+                print(f"[ERROR] failed to synthesize {text_file.name}: {e}")
+    cache.evict()
+    log_cache_stats(job_id, cache.hits, cache.misses)
+
+    start_video(job_id, file_id, render_profile, wait_for_slides)
     return audio_files
+
+@celery_app.task(bind=True, queue='tts_tasks', name='tts_processor.synthesize_slide', acks_late=True,
+                 max_retries=TTS_MAX_RETRIES)
+def synthesize_slide_task(self, text_file: str, job_id: str, voice: str, tts_engine: str, piper_args: list[float],
+                          file_id: str, render_profile: str | dict, slide_count: int, wait_for_slides: bool = False):
+    """
+    One slide of a per-slide TTS job. A failure retries only this slide; once
+    retries run out the slide is recorded as failed. Whichever slide completes
+    the job's barrier, succeeded or not, starts the video stage.
+    """
+    text_path = Path(text_file)
+    barrier = slide_barrier(job_id, slide_count)
+    if barrier.has_arrived(text_path.stem):
+        print(f"[INFO] {text_path.name} of job {job_id} already finished, skipping redelivery")
+        return None
+
+    cache = ArtifactCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES, f".{AUDIO_FORMAT}")
+    output_file = None
+    try:
+        output_file = synthesize_slide(text_path, OUTPUT_DIR / job_id, voice, tts_engine, piper_args, cache)
+        ok = True
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            print(f"[WARN] failed to synthesize {text_path.name} ({e}), retrying")
+            raise self.retry(exc=e, countdown=TTS_RETRY_DELAY * 2 ** self.request.retries)
+        print(f"[ERROR] failed to synthesize {text_path.name} after {self.request.retries + 1} attempts: {e}")
+        ok = False
+
+    record_cache_stats(barrier, text_path.stem, cache)
+    if barrier.arrive(text_path.stem, ok):
+        failed = barrier.failed()
+        print(f"[INFO] All {slide_count} slides of job {job_id} finished"
+              + (f", {len(failed)} failed: {', '.join(failed)}" if failed else ""))
+        cache.evict()
+        log_cache_stats(job_id, *job_cache_stats(barrier))
+        start_video(job_id, file_id, render_profile, wait_for_slides)
+    return str(output_file) if output_file else None
@@ -0,0 +1,103 @@
+"""
+Per-slide render benchmark for the video producer.
+
+Builds a synthetic deck (test-pattern slide images + MP3 narration like the TTS
+stage writes) and renders every slide with each render mode, reporting wall
+time, CPU-seconds (user+sys of the ffmpeg/ffprobe children) per slide and the
+total size of the rendered segments.
+
+Modes: legacy (original 6-process chain), single-pass (one ffmpeg call,
+image looped at full FPS) and still (one ffmpeg call, SLIDE_ENCODE=still).
+Every mode runs once per render profile.
+
+    python bench_render.py --slides 40 --duration 8
+    python bench_render.py --modes still --profiles draft standard archive
+"""
+import argparse
+import os
+import resource
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+# Keep the service module from touching /artifacts when imported here.
+os.environ.setdefault("VIDEO_OUT_DIR", tempfile.mkdtemp(prefix="bench-video-out-"))
+
+import ffmpeg_service  # noqa: E402
+from render_profiles import RENDER_PROFILES, get_render_profile  # noqa: E402
+
+
+def children_cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def build_deck(deck_dir: Path, slides: int, duration: float):
+    deck_dir.mkdir(parents=True, exist_ok=True)
+    pairs = []
+    for i in range(1, slides + 1):
+        image = deck_dir / f"slide_{i:02d}.png"
+        audio = deck_dir / f"slide_{i:02d}.mp3"
+        subprocess.run([
+            'ffmpeg', '-y', '-f', 'lavfi', '-i', 'testsrc2=size=1280x720',
+            '-frames:v', '1', str(image)
+        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        subprocess.run([
+            'ffmpeg', '-y', '-f', 'lavfi', '-i', f"sine=frequency={220 + i * 5}:duration={duration}",
+            '-ar', '48000', '-ac', '1', '-b:a', '192k', str(audio)
+        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        pairs.append((image, audio))
+    return pairs
+
+
+def run_mode(mode, profile, pairs, out_dir: Path):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # Legacy intermediates are named like its outputs, so they need their own directory
+    work_dir = out_dir / "work"
+    work_dir.mkdir(exist_ok=True)
+    walls, cpus = [], []
+    for idx, (image, audio) in enumerate(pairs, 1):
+        segment = out_dir / f"output_{idx:03d}.mp4"
+        cpu_start = children_cpu_seconds()
+        start = time.perf_counter()
+        if mode == "legacy":
+            ffmpeg_service.render_segment_legacy(idx, image, audio, segment, work_dir, profile)
+        elif mode == "still":
+            ffmpeg_service.render_segment(image, audio, segment, profile, encode="still")
+        else:
+            ffmpeg_service.render_segment(image, audio, segment, profile, encode="standard")
+        walls.append(time.perf_counter() - start)
+        cpus.append(children_cpu_seconds() - cpu_start)
+    size = sum((out_dir / f"output_{idx:03d}.mp4").stat().st_size for idx in range(1, len(pairs) + 1))
+    return walls, cpus, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slides", type=int, default=40)
+    parser.add_argument("--duration", type=float, default=8.0, help="narration seconds per slide")
+    parser.add_argument("--modes", nargs="+", default=["legacy", "single-pass", "still"])
+    parser.add_argument("--profiles", nargs="+", default=["standard"],
+                        choices=sorted(RENDER_PROFILES))
+    parser.add_argument("--workdir", type=Path, default=None)
+    args = parser.parse_args()
+
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="bench-render-"))
+    print(f"Building {args.slides}-slide deck in {workdir} ...")
+    pairs = build_deck(workdir / "deck", args.slides, args.duration)
+
+    print(f"{'mode':<12} {'profile':<9} {'total wall s':>12} {'wall s/slide':>12} {'p95 wall s':>11} "
+          f"{'cpu s/slide':>12} {'output MB':>10}")
+    for profile_name in args.profiles:
+        profile = get_render_profile(profile_name)
+        for mode in args.modes:
+            walls, cpus, size = run_mode(mode, profile, pairs, workdir / f"{mode}-{profile_name}")
+            p95 = sorted(walls)[max(0, int(round(0.95 * len(walls))) - 1)]
+            print(f"{mode:<12} {profile_name:<9} {sum(walls):>12.2f} {statistics.mean(walls):>12.3f} {p95:>11.3f} "
+                  f"{statistics.mean(cpus):>12.3f} {size / 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
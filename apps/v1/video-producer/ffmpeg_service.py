@@ -1,9 +1,20 @@
 import os
 import subprocess
+import time
 import shutil
 from celery import Celery
 from pathlib import Path
 import asyncio, aio_pika, traceback, json
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from artifact_cache import ArtifactCache, file_digest, files_digest, link_or_copy
+from cpu_limits import available_cpus
+import media_probe
+from hls import ProgressivePlaylist, append_ready_clips
+from job_barrier import FileBarrier, claim_marker
+from progress import JobProgress, run_ffmpeg
+from progress_publisher import ProgressPublisher
+from render_profiles import get_render_profile
+import threading
 
 # Environment-based configuration
 RABBITMQ_HOST = os.getenv("RABBITMQ_HOST", "rabbitmq")
@@ -11,19 +22,558 @@ RABBITMQ_USER = os.getenv("RABBIT_USERNAME", "guest")
 RABBITMQ_PASS = os.getenv("RABBIT_PASSWORD", "guest")
 RABBITMQ_PORT = os.getenv("RABBITMQ_PORT", "5672")
 RABBITMQ_VHOST = os.getenv("RABBITMQ_VHOST", "/")
-RES_HEIGHT = os.getenv("RES_HEIGHT", "360")
-RES_WIDTH = os.getenv("RES_WIDTH", "640")
-FPS = os.getenv("FPS", "30")
+# Threads given to each ffmpeg encode, and how many slide segments render at
+# once (0 = split the available cores between the WORKER_CONCURRENCY Celery
+# processes, FFMPEG_THREADS per encode). WORKER_CONCURRENCY is also what the
+# container passes to celery worker --concurrency.
+FFMPEG_THREADS = int(os.getenv("FFMPEG_THREADS", "2"))
+RENDER_CONCURRENCY = int(os.getenv("RENDER_CONCURRENCY", "0"))
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "1"))
+
+# "single-pass" renders each slide with one ffmpeg call; "legacy" keeps the
+# original CBR convert -> trim -> render -> re-encode chain.
+RENDER_MODE = os.getenv("RENDER_MODE", "single-pass").lower()
+# "auto" stream-copies the final concat when every segment shares one stream
+# layout and re-encodes otherwise; "reencode" always uses filter_complex.
+CONCAT_MODE = os.getenv("CONCAT_MODE", "auto").lower()
+# Also publish a growing HLS playlist so playback can start before the final
+# MP4 is concatenated; chunks are cut at forced keyframes every HLS_SEGMENT_SECONDS.
+HLS_OUTPUT = os.getenv("HLS_OUTPUT", "false").lower() in ("1", "true", "yes")
+HLS_SEGMENT_SECONDS = float(os.getenv("HLS_SEGMENT_SECONDS", "4"))
+# "still" encodes slides from a 1 fps source duplicated up to FPS with a long
+# GOP (cheap for static images); "standard" loops the image at full FPS.
+SLIDE_ENCODE = os.getenv("SLIDE_ENCODE", "still").lower()
+STILL_SOURCE_FPS = os.getenv("STILL_SOURCE_FPS", "1")
+STILL_GOP_SECONDS = int(os.getenv("STILL_GOP_SECONDS", "10"))
+# Print per-segment probe diagnostics before the concat (off by default).
+SEGMENT_DIAGNOSTICS = os.getenv("SEGMENT_DIAGNOSTICS", "false").lower() in ("1", "true", "yes")
+# Decks with more than FANOUT_CHUNK_SIZE slides to render are split into
+# render_chunk tasks of that size, so every video_producer replica can work on
+# one job; 0 renders the whole deck inside produce_video. Each chunk renders
+# FANOUT_CHUNK_WORKERS segments at a time and retries on its own.
+FANOUT_CHUNK_SIZE = int(os.getenv("FANOUT_CHUNK_SIZE", "0"))
+FANOUT_CHUNK_WORKERS = int(os.getenv("FANOUT_CHUNK_WORKERS", "1"))
+FANOUT_MAX_RETRIES = int(os.getenv("FANOUT_MAX_RETRIES", "3"))
+FANOUT_RETRY_DELAY = int(os.getenv("FANOUT_RETRY_DELAY", "10"))
 
 CELERY_BROKER_URL = f"amqp://{RABBITMQ_USER}:{RABBITMQ_PASS}@{RABBITMQ_HOST}:{RABBITMQ_PORT}{RABBITMQ_VHOST}"
 celery_app = Celery('video_producer', broker=CELERY_BROKER_URL)
+# Take one task at a time so queued chunks spread across replicas instead of
+# sitting in the prefetch buffer of whichever worker connected first.
+celery_app.conf.worker_prefetch_multiplier = 1
+progress_publisher = ProgressPublisher(CELERY_BROKER_URL)
 
 OUTPUT_BASE = Path(os.getenv("VIDEO_OUT_DIR", "/artifacts/video-output/"))
 OUTPUT_BASE.mkdir(parents=True, exist_ok=True)
 
+# Normalized bumpers are shared across jobs, keyed by content and encode settings.
+BUMPER_CACHE_DIR = Path(os.getenv("BUMPER_CACHE_DIR", "/artifacts/cache/bumpers/"))
+BUMPER_CACHE_MAX_BYTES = int(os.getenv("BUMPER_CACHE_MAX_MB", "2048")) * 1024 * 1024
+# Rendered slide segments, keyed by image bytes + audio bytes + render settings.
+SEGMENT_CACHE_DIR = Path(os.getenv("SEGMENT_CACHE_DIR", "/artifacts/cache/segments/"))
+SEGMENT_CACHE_MAX_BYTES = int(os.getenv("SEGMENT_CACHE_MAX_MB", "10240")) * 1024 * 1024
+
+
+def render_workers():
+    if RENDER_CONCURRENCY > 0:
+        return RENDER_CONCURRENCY
+    return max(1, available_cpus() // (max(1, WORKER_CONCURRENCY) * max(1, FFMPEG_THREADS)))
+
+def profile_params(profile):
+    """Profile settings as a stable tuple for cache keys."""
+    return tuple(f"{k}={profile[k]}" for k in sorted(profile) if k != "name")
+
+# Every encode in a job takes its codec settings from the same profile, so
+# slides and bumpers stay concat-compatible.
+def video_encode_args(profile):
+    return ['-c:v', 'libx264', '-preset', profile["preset"], '-crf', str(profile["crf"])]
+
+def audio_encode_args(profile):
+    return ['-c:a', 'aac', '-b:a', profile["audio_bitrate"], '-ar', '48000', '-ac', '2']
+
+def scale_pad_filter(width, height):
+    return (
+        f"scale='if(gt(a,{width}/{height}),{width},-1)':'if(gt(a,{width}/{height}),-1,{height})',"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1:1,format=yuv420p"
+    )
+
+def fits_frame(image, width, height):
+    """True when a slide image is already the output size, so it needs no scale/pad."""
+    try:
+        return media_probe.dimensions(image) == (int(width), int(height))
+    except (OSError, RuntimeError, KeyError, ValueError, IndexError):
+        return False
+
+def known_duration(path):
+    """Media duration for progress estimates, or None when it can't be probed."""
+    try:
+        return media_probe.duration(path)
+    except (OSError, RuntimeError, KeyError, ValueError):
+        return None
+
+def gop_args(profile, encode=None):
+    """
+    Keyframe placement shared by slide and bumper encodes. x264 derives the
+    SPS frame-number size from the GOP length, so both must use the same -g
+    or the final concat can't be a stream copy. HLS output additionally forces
+    a keyframe every HLS_SEGMENT_SECONDS so clips can be cut into chunks.
+    encode defaults to SLIDE_ENCODE.
+    """
+    args = []
+    if (encode or SLIDE_ENCODE) == "still":
+        args += ['-g', str(int(float(profile["fps"]) * STILL_GOP_SECONDS))]
+    if HLS_OUTPUT:
+        args += ['-force_key_frames', f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})"]
+    return args
+
+def run_checked(cmd, what):
+    """Run one ffmpeg step of the legacy chain, raising with its stderr when it fails."""
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        print(result.stderr.decode(errors="replace"))
+        raise RuntimeError(f"❌ {what} failed")
+
+def reencode_clip(input_path, output_path, profile):
+    run_checked([
+        'ffmpeg', '-y', '-i', str(input_path),
+        *video_encode_args(profile),
+        '-pix_fmt', 'yuv420p', *audio_encode_args(profile),
+        str(output_path)
+    ], f"Re-encoding {input_path}")
+
+def reencode_bumper(input_path, output_path, profile, progress=None, label=None):
+    vf_filter = scale_pad_filter(profile["width"], profile["height"])
+    returncode, stderr = run_ffmpeg([
+        'ffmpeg', '-y', '-i', str(input_path),
+        '-vf', vf_filter,
+        '-r', str(profile["fps"]),
+        *video_encode_args(profile), *gop_args(profile),
+        *audio_encode_args(profile),
+        str(output_path)
+    ], progress, label or Path(input_path).name, known_duration(input_path) if progress else None)
+    if returncode != 0:
+        print(f"FFmpeg bumper re-encode failed for {input_path}!")
+        print(stderr)
+    return returncode == 0
+
+def prepare_bumper(source, job_path, cache, profile, progress=None):
+    """
+    Normalize a bumper to the job's render profile and hard-link it to
+    job_path. Normalized bumpers are cached by content + encode settings, so a
+    repeat upload costs one hash instead of a transcode.
+    """
+    if not source.exists():
+        return None
+    if not cache.enabled:
+        if not reencode_bumper(source, job_path, profile, progress, job_path.stem):
+            raise RuntimeError(f"❌ Bumper processing failed for {source}")
+        return job_path
+
+    key = file_digest(source, *profile_params(profile), *gop_args(profile))
+    cached = cache.lookup(key)
+    if cached is not None:
+        print(f"♻️ Bumper cache hit for {source.name}")
+        if progress:
+            progress.file_done(job_path.stem)
+    else:
+        print(f"Bumper cache miss for {source.name}, re-encoding")
+        temp_path = cache.temp_path(key)
+        if not reencode_bumper(source, temp_path, profile, progress, job_path.stem):
+            temp_path.unlink(missing_ok=True)
+            raise RuntimeError(f"❌ Bumper processing failed for {source}")
+        cached = cache.commit(key, temp_path)
+    return link_or_copy(cached, job_path)
+
+def is_cbr(audio_file):
+    try:
+        bitrate_info = media_probe.bit_rate(audio_file)
+    except RuntimeError:
+        bitrate_info = None
+
+    if bitrate_info:
+        print(f"🔍 {audio_file.name} is CBR with bitrate {bitrate_info}")
+        return True
+    else:
+        print(f"⚠️ {audio_file.name} may be VBR or bitrate info unavailable.")
+        return False
+
+def convert_to_cbr(input_audio, output_audio):
+    if is_cbr(input_audio):
+        print(f"✅ Skipping conversion for {input_audio.name}, already CBR.")
+        shutil.copy(input_audio, output_audio)
+    else:
+        print(f"🔄 Converting {input_audio.name} to CBR → {output_audio.name}")
+        run_checked([
+            'ffmpeg', '-y', '-i', str(input_audio),
+            '-ar', '48000',
+            '-ac', '2',
+            '-b:a', '192k',
+            '-c:a', 'aac',
+            '-fflags', '+bitexact',
+            '-avoid_negative_ts', 'make_zero',
+            str(output_audio)
+        ], f"CBR conversion of {input_audio}")
+
+def trim_audio(input_audio, output_audio, duration):
+    run_checked([
+        'ffmpeg', '-y', '-i', str(input_audio),
+        '-t', f"{duration:.3f}", str(output_audio)
+    ], f"Trimming {input_audio}")
+
+def render_segment_legacy(idx, image, audio, output_path, work_dir, profile):
+    """
+    Original per-slide chain: CBR convert, probe, trim, loop-image render and a
+    final re-encode. Kept selectable via RENDER_MODE=legacy and for benchmarks.
+    """
+    cbr_audio = work_dir / f"audio_cbr_{idx:03d}.mp3"
+    video_path = work_dir / f"output_{idx:03d}.mp4"
+
+    #Convert to CBR
+    convert_to_cbr(audio, cbr_audio)
+
+    print(f"Getting audio duration...")
+    duration = media_probe.duration(cbr_audio)
+
+    trimmed_audio = work_dir / f"audio_trimmed_{idx:03d}.mp3"
+    trim_audio(cbr_audio, trimmed_audio, duration)
+
+    print(f"Running subprocess...")
+    print(f"Scale width: {profile['width']}, Scale height: {profile['height']}")
+    run_checked([
+        'ffmpeg', '-y', '-loop', '1', '-i', str(image),
+        '-i', str(trimmed_audio),
+        '-vf', scale_pad_filter(profile["width"], profile["height"]),
+        '-r', str(profile["fps"]),
+        *video_encode_args(profile), '-tune', 'stillimage', '-shortest',
+        *audio_encode_args(profile),
+        '-t', f"{duration:.3f}", str(video_path)
+    ], f"Legacy render of {image}")
+
+    # Re-encode
+    print(f"Re-encoding...")
+    reencode_clip(video_path, output_path, profile)
+
+def render_segment(image, audio, output_path, profile, progress=None, label=None, encode=None):
+    """
+    Render one (slide image, narration audio) pair into a final, concat-ready
+    segment with a single ffmpeg invocation. Scaling/padding and audio
+    resampling happen in one filter graph and the segment length follows the
+    audio, so no separate probe, CBR conversion, trim or re-encode is needed.
+
+    In "still" encode mode the image is looped at STILL_SOURCE_FPS, so the
+    scale/pad chain runs once per source frame and the fps filter duplicates
+    it up to the output rate; x264 codes the duplicates as skip blocks. The
+    output stays constant-frame-rate so it concatenates with the bumpers.
+    Images the extractor already rendered at the profile's size skip the
+    scale/pad and only get their pixel format converted.
+    """
+    encode = encode or SLIDE_ENCODE
+    fps = profile["fps"]
+    source_fps = STILL_SOURCE_FPS if encode == "still" else fps
+    if fits_frame(image, profile["width"], profile["height"]):
+        video_filter = "setsar=1:1,format=yuv420p"
+    else:
+        video_filter = scale_pad_filter(profile["width"], profile["height"])
+    filter_graph = (
+        f"[0:v]{video_filter},fps={fps}[v];"
+        f"[1:a]aresample=48000,aformat=sample_fmts=fltp:channel_layouts=stereo,asetpts=PTS-STARTPTS[a]"
+    )
+    returncode, stderr = run_ffmpeg([
+        'ffmpeg', '-y',
+        '-loop', '1', '-framerate', str(source_fps), '-i', str(image),
+        '-i', str(audio),
+        '-filter_complex', filter_graph,
+        '-map', '[v]', '-map', '[a]',
+        '-r', str(fps),
+        *video_encode_args(profile), '-tune', 'stillimage', '-pix_fmt', 'yuv420p',
+        '-threads', str(FFMPEG_THREADS), *gop_args(profile, encode),
+        *audio_encode_args(profile),
+        # End on the audio and keep the muxer from overshooting the looped image.
+        '-shortest', '-fflags', '+shortest', '-max_interleave_delta', '100M',
+        str(output_path)
+    ], progress, label or Path(image).stem, known_duration(audio) if progress else None)
+    if returncode != 0:
+        print(f"❌ FFmpeg segment render failed for {image}!")
+        print(stderr)
+        raise RuntimeError(f"Segment render failed for {image}")
+
+def segment_key(image, audio, profile, encode=None):
+    encode = encode or SLIDE_ENCODE
+    return files_digest([image, audio], RENDER_MODE, encode, STILL_SOURCE_FPS, 'stillimage',
+                        *profile_params(profile), *gop_args(profile, encode))
+
+def render_slide_segment(idx, image, audio, segment_path, key, cache, work_dir, profile, progress=None):
+    """
+    Render one slide into segment_path. With the segment cache enabled the
+    render goes into the cache first and the job gets a hard link, so later
+    revisions of the deck can reuse it.
+    """
+    print(f"Processing image file: {image}")
+    print(f"Processing audio file: {audio}")
+    target = cache.temp_path(key) if cache.enabled else segment_path
+    try:
+        if RENDER_MODE == "legacy":
+            render_segment_legacy(idx, image, audio, target, work_dir, profile)
+            if progress:
+                progress.file_done(f"slide_{idx:03d}")
+        else:
+            render_segment(image, audio, target, profile, progress=progress, label=f"slide_{idx:03d}")
+    except Exception:
+        if cache.enabled:
+            target.unlink(missing_ok=True)
+        raise
+    if cache.enabled:
+        link_or_copy(cache.commit(key, target, evict=False), segment_path)
+
+def plan_segment_renders(slides, cache, profile):
+    """
+    Split (idx, image, audio, segment_path) slides into work for this job.
+    Returns (renders, reused, duplicates): renders are the jobs that still
+    need ffmpeg, reused maps idx to a cached segment from an earlier job, and
+    duplicates maps idx to the idx whose identical segment it can share.
+    """
+    renders, reused, duplicates = [], {}, {}
+    leader_by_key = {}
+    for idx, image, audio, segment_path in slides:
+        key = segment_key(image, audio, profile)
+        if key in leader_by_key:
+            duplicates[idx] = leader_by_key[key]
+            continue
+        leader_by_key[key] = idx
+        cached = cache.lookup(key)
+        if cached is not None:
+            reused[idx] = cached
+        else:
+            renders.append((idx, image, audio, segment_path, key))
+    return renders, reused, duplicates
+
+def render_segments_parallel(jobs, render_fn, workers):
+    """
+    Render job tuples (idx first) on a bounded worker pool.
+    Every worker drives one ffmpeg process, so threads are enough here. Segment
+    paths are fixed by idx, so completion order never changes the final order.
+    The first failure cancels everything still queued and is re-raised.
+    """
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="segment")
+    futures = {pool.submit(render_fn, *job): job[0] for job in jobs}
+    done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+    for future in done:
+        if future.exception() is not None:
+            print(f"❌ Segment {futures[future]:03d} failed, cancelling remaining renders")
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise future.exception()
+    pool.shutdown()
+
+def concat_with_filter_complex(segment_paths, output_path, profile, progress=None, duration=None):
+    filter_complex = ''.join([f'[{i}:v][{i}:a]' for i in range(len(segment_paths))])
+    filter_complex += f'concat=n={len(segment_paths)}:v=1:a=1[v][a]'
+    cmd = ['ffmpeg', '-y']
+    for seg in segment_paths:
+        cmd += ['-i', str(seg)]
+    cmd += [
+        '-filter_complex', filter_complex,
+        '-map', '[v]', '-map', '[a]',
+        *video_encode_args(profile), *audio_encode_args(profile),
+        '-pix_fmt', 'yuv420p', '-movflags', '+faststart',
+        str(output_path)
+    ]
+    print(f"Running ffmpeg concat with filter_complex...")
+    returncode, stderr = run_ffmpeg(cmd, progress, "concat", duration)
+    if returncode != 0:
+        print(f"ffmpeg exited with code {returncode}")
+        print(stderr)
+
+def segments_share_layout(segment_paths):
+    """
+    True when every segment has one video and one audio stream, in the same
+    order, with identical codec parameters, so the concat demuxer can join
+    them without decoding.
+    """
+    reference = None
+    for seg in segment_paths:
+        try:
+            layout = media_probe.stream_layout(seg)
+        except (OSError, RuntimeError) as e:
+            print(f"⚠️ Could not probe {seg}: {e}")
+            return False
+        if not layout or [s[0] for s in layout] != ["video", "audio"]:
+            print(f"⚠️ {seg} does not have exactly one video and one audio stream")
+            return False
+        if reference is None:
+            reference = layout
+        elif layout != reference:
+            print(f"⚠️ {seg} stream layout differs from {segment_paths[0]}:\n  {layout}\n  {reference}")
+            return False
+    return reference is not None
+
+def concat_with_demuxer(segment_paths, output_path, filelist_path, progress=None, duration=None):
+    with filelist_path.open('w') as f:
+        for seg in segment_paths:
+            escaped = str(seg).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    print(f"Running ffmpeg concat demuxer with stream copy...")
+    returncode, stderr = run_ffmpeg([
+        'ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', str(filelist_path),
+        '-map', '0:v:0', '-map', '0:a:0',
+        '-c', 'copy', '-movflags', '+faststart',
+        str(output_path)
+    ], progress, "concat", duration)
+    if returncode != 0:
+        print(f"ffmpeg concat demuxer exited with code {returncode}")
+        print(stderr)
+        Path(output_path).unlink(missing_ok=True)
+        return False
+    return True
+
+def concat_segments(segment_paths, output_path, filelist_path, profile, progress=None):
+    """
+    Join the final segment list. Slides and processed bumpers are all encoded
+    with the same parameters, so normally this is a stream copy; the
+    filter_complex re-encode only runs when the layouts do not line up.
+    """
+    if SEGMENT_DIAGNOSTICS:
+        for seg in segment_paths:
+            print(media_probe.describe(seg))
+    duration = None
+    if progress:
+        durations = [known_duration(seg) for seg in segment_paths]
+        duration = sum(durations) if None not in durations else None
+        progress.start_stage("concat", 1)
+    if CONCAT_MODE != "reencode" and segments_share_layout(segment_paths):
+        if concat_with_demuxer(segment_paths, output_path, filelist_path, progress, duration):
+            return
+        print("⚠️ Stream-copy concat failed, falling back to filter_complex re-encode")
+    else:
+        print("Segments need re-encoding to concatenate")
+    concat_with_filter_complex(segment_paths, output_path, profile, progress, duration)
+
+async def send_download_ready_message(file_path, job_id, file_id, event="artifact-ready"):
+    try:
+        connection = await aio_pika.connect_robust(CELERY_BROKER_URL)
+        channel = await connection.channel()
+        await channel.declare_queue("download_ready", durable=True)
+        message = {
+            "event": event,
+            "file_path": str(file_path),
+            "job_id": job_id,
+            "file_id": file_id
+        }
+        await channel.default_exchange.publish(
+            aio_pika.Message(
+                body=json.dumps(message).encode(),
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT
+            ),
+            routing_key="download_ready"
+        )
+        await connection.close()
+        print(f"Sent '{event}' message to 'download_ready' queue: {message}")
+    except Exception as e:
+        print(f"Failed to send {event} message")
+        traceback.print_exc()
+
+def segment_file(temp_adj_dir, idx):
+    return Path(temp_adj_dir) / f"output_{idx:03d}.mp4"
+
+def finish_video(job_id, file_id, profile, segments, final_output, filelist_path, work_dirs, progress):
+    """Concatenate the ordered segment list, clean up and announce the artifact."""
+    print(f"Starting concatenation...")
+    final_output = Path(final_output)
+    concat_segments(segments, final_output, Path(filelist_path), profile, progress)
+
+    if final_output.exists():
+        print(f"✅ Final output video written to: {final_output}")
+        progress.start_stage("complete", 0)
+        for work_dir in work_dirs:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        print(f"Calling send_download_ready_message with file_id: {file_id}")
+        asyncio.run(send_download_ready_message(
+            file_path=final_output,
+            job_id=job_id,
+            file_id=file_id
+        ))
+        print("Message send attempted.")
+
+        return str(final_output)
+    else:
+        raise RuntimeError("❌ Final video creation failed.")
+
+def stream_announcer(job_id, file_id, marker=None):
+    """
+    on_update callback that sends "stream-ready" once the playlist has its
+    first clip. With a marker file, "once" holds across every worker of a
+    fanned-out job.
+    """
+    announced = threading.Event()
+
+    def announce_stream(stream):
+        if not stream.clips or announced.is_set():
+            return
+        announced.set()
+        if marker is None or claim_marker(marker):
+            asyncio.run(send_download_ready_message(
+                file_path=stream.playlist_path,
+                job_id=job_id,
+                file_id=file_id,
+                event="stream-ready"
+            ))
+
+    return announce_stream
+
+def fanout_dir(job_id):
+    return OUTPUT_BASE / job_id / "fanout"
+
+def load_fanout(job_id):
+    return json.loads((fanout_dir(job_id) / "manifest.json").read_text())
+
+def fanout_barrier(job):
+    return FileBarrier(fanout_dir(job["job_id"]) / "barrier", len(job["chunks"]))
+
+def mark_segments_ready(job, indices):
+    for idx in indices:
+        (fanout_dir(job["job_id"]) / "ready" / str(idx)).touch()
+
+def fanout_renders_done(job):
+    """Planned renders of a fanned-out job that are finished, across all chunks."""
+    rendered = {chunk_job[0] for chunk in job["chunks"] for chunk_job in chunk}
+    try:
+        ready = {int(marker.name) for marker in (fanout_dir(job["job_id"]) / "ready").iterdir()}
+    except FileNotFoundError:
+        return 0
+    return len(rendered & ready)
+
+def sync_fanout_playlist(job):
+    """Append every finished clip of a fanned-out job to its HLS playlist."""
+    if not job["hls_dir"]:
+        return
+    last = job["slide_count"] + 1
+    ready_dir = fanout_dir(job["job_id"]) / "ready"
+
+    def ready_clip(position):
+        if position in (0, last):
+            name = "bumper_in" if position == 0 else "bumper_out"
+            return job[name], name
+        if (ready_dir / str(position)).exists():
+            return segment_file(job["temp_adj_dir"], position), f"slide_{position:03d}"
+        return None
+
+    append_ready_clips(job["hls_dir"], HLS_SEGMENT_SECONDS, last + 1, ready_clip,
+                       stream_announcer(job["job_id"], job["file_id"], Path(job["hls_dir"]) / ".announced"))
+
+def write_fanout(job):
+    """Start a fanned-out job's state on the shared volume from a clean slate."""
+    root = fanout_dir(job["job_id"])
+    shutil.rmtree(root, ignore_errors=True)
+    (root / "ready").mkdir(parents=True)
+    temp_path = root / "manifest.json.tmp"
+    temp_path.write_text(json.dumps(job))
+    os.replace(temp_path, root / "manifest.json")
+
 @celery_app.task(queue='video_producer', name="ffmpeg_service.produce_video")
-def produce_video(job_id, file_id):
+def produce_video(job_id, file_id, render_profile=None):
     print(f"Received task for job id: {job_id}")
+    profile = get_render_profile(render_profile)
+    print(f"Using render profile {profile['name']}: {profile}")
     image_dir = Path(f"/artifacts/slides/{job_id}")
     audio_dir = Path(f"/artifacts/tts_output/{job_id}")
     output_dir = OUTPUT_BASE / job_id
@@ -38,261 +588,201 @@ def produce_video(job_id, file_id):
 
     bumper_path_in = Path(f"/artifacts/bumpers/{job_id}-bumper1.mp4").resolve()
     bumper_path_out = Path(f"/artifacts/bumpers/{job_id}-bumper2.mp4").resolve()
-    bumper_path_in_processed = Path(f"/artifacts/bumpers/{job_id}-bumper1-proc.mp4").resolve()
-    bumper_path_out_processed = Path(f"/artifacts/bumpers/{job_id}-bumper2-proc.mp4").resolve()
     final_output = final_output_dir / f"{job_id}.mp4"
 
-    def get_audio_duration(audio_path):
-        result = subprocess.run(
-            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-             '-of', 'default=noprint_wrappers=1:nokey=1', str(audio_path)],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
-        return float(result.stdout.strip())
-
-    def reencode_clip(input_path, output_path):
-        subprocess.run([
-            'ffmpeg', '-y', '-i', str(input_path),
-            '-c:v', 'libx264', '-preset', 'fast',
-            '-pix_fmt', 'yuv420p', '-c:a', 'aac',
-            '-ar', '48000', '-ac', '2', '-b:a', '192k',
-            str(output_path)
-        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    def reencode_bumper(input_path, output_path, width, height, fps):
-        vf_filter = (
-            f"scale='if(gt(a,{width}/{height}),{width},-1)':'if(gt(a,{width}/{height}),-1,{height})',"
-            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1:1,format=yuv420p"
-        )
-        result = subprocess.run([
-            'ffmpeg', '-y', '-i', str(input_path),
-            '-vf', vf_filter,
-            '-r', str(fps),
-            '-c:v', 'libx264', '-preset', 'fast',
-            '-c:a', 'aac', '-b:a', '192k', '-ar', '48000', '-ac', '2',
-            str(output_path)
-        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if result.returncode != 0:
-            print(f"FFmpeg bumper re-encode failed for {input_path}!")
-            print(result.stderr.decode())
-    
-    def is_cbr(audio_file):
-        ffprobe_command = [
-            'ffprobe', '-v', 'error', '-select_streams', 'a:0',
-            '-show_entries', 'format=bit_rate',
-            '-of', 'default=noprint_wrappers=1:nokey=1', str(audio_file)
-        ]
-        result = subprocess.run(ffprobe_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        bitrate_info = result.stdout.decode('utf-8').strip()
-    
-        if bitrate_info:
-            print(f"🔍 {audio_file.name} is CBR with bitrate {bitrate_info}")
-            return True
-        else:
-            print(f"⚠️ {audio_file.name} may be VBR or bitrate info unavailable.")
-            return False
-
-    def convert_to_cbr(input_audio, output_audio):
-        if is_cbr(input_audio):
-            print(f"✅ Skipping conversion for {input_audio.name}, already CBR.")
-            shutil.copy(input_audio, output_audio)
-        else:
-            print(f"🔄 Converting {input_audio.name} to CBR → {output_audio.name}")
-            subprocess.run([
-                'ffmpeg', '-y', '-i', str(input_audio),
-                '-ar', '48000',
-                '-ac', '2',
-                '-b:a', '192k',
-                '-c:a', 'aac',
-                '-fflags', '+bitexact',
-                '-avoid_negative_ts', 'make_zero',
-                str(output_audio)
-            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    def trim_audio(input_audio, output_audio, duration):
-        subprocess.run([
-            'ffmpeg', '-y', '-i', str(input_audio),
-            '-t', f"{duration:.3f}", str(output_audio)
-        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-    def check_segment_properties(segment_path):
-        cmd = [
-            "ffprobe",
-            "-v", "error",
-            "-select_streams", "v:0",
-            "-show_entries", "stream=width,height,r_frame_rate,pix_fmt",
-            "-of", "compact=p=0:nk=1",
-            str(segment_path)
-        ]
-        v_info = subprocess.check_output(cmd).decode().strip()
-        cmd = [
-            "ffprobe",
-            "-v", "error",
-            "-select_streams", "a:0",
-            "-show_entries", "stream=sample_rate,channels,sample_fmt",
-            "-of", "compact=p=0:nk=1",
-            str(segment_path)
-        ]
-        a_info = subprocess.check_output(cmd).decode().strip()
-        print(f"{segment_path}:\n  Video: {v_info}\n  Audio: {a_info}")
-    
-    def check_segment_integrity(segment_path):
-        info = subprocess.check_output([
-            'ffprobe', '-v', 'error',
-            '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1',
-            str(segment_path)
-        ]).decode().strip()
-        print(f"{segment_path} duration: {info}")
-
-        streams = subprocess.check_output([
-            'ffprobe', '-v', 'error',
-            '-show_entries', 'stream=index,codec_type', '-of', 'csv=p=0',
-            str(segment_path)
-        ]).decode().strip()
-        print(f"{segment_path} streams:\n{streams}") 
-
-    def concat_with_filter_complex(segment_paths, output_path):
-        filter_complex = ''.join([f'[{i}:v][{i}:a]' for i in range(len(segment_paths))])
-        filter_complex += f'concat=n={len(segment_paths)}:v=1:a=1[v][a]'
-        cmd = ['ffmpeg', '-y']
-        for seg in segment_paths:
-            check_segment_properties(seg)
-            check_segment_integrity(seg)
-        for seg in segment_paths:
-            cmd += ['-i', str(seg)]
-        cmd += [
-            '-filter_complex', filter_complex,
-            '-map', '[v]', '-map', '[a]',
-            '-c:v', 'libx264', '-preset', 'fast',
-            '-c:a', 'aac', '-b:a', '192k',
-            '-pix_fmt', 'yuv420p', '-movflags', '+faststart',
-            '-progress', 'pipe:1', '-nostats',
-            str(output_path)
-        ]
-        print(f"Running ffmpeg concat with filter_complex...")
-        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        for line in proc.stdout:
-            print(line.strip())
-        proc.wait()
-        if proc.returncode != 0:
-            print(f"ffmpeg exited with code {proc.returncode}")
- 
-    image_files = {img.stem: img for img in image_dir.glob("*") if img.suffix.lower() in [".png", ".jpg", ".jpeg"]}
-    audio_files = {aud.stem: aud for aud in audio_dir.glob("*") if aud.suffix.lower() in [".mp3", ".mp4", ".wav"]}
+    image_files = {img.stem: img for img in image_dir.glob("*") if img.suffix.lower() in [".png", ".jpg", ".jpeg", ".ppm"]}
+    audio_files = {aud.stem: aud for aud in audio_dir.glob("*") if aud.suffix.lower() in [".mp3", ".mp4", ".wav", ".flac"]}
     common_keys = sorted(set(image_files.keys()) & set(audio_files.keys()))
 
     if not common_keys:
         raise RuntimeError("❌ No matching images or audios found")
 
-    for idx, key in enumerate(common_keys, 1):
-        image = image_files[key]
-        audio = audio_files[key]
-        print(f"Processing image file: {image}")
-        print(f"Processing audio file: {audio}")
-
-        #Output file paths
-        cbr_audio = output_dir / f"audio_cbr_{idx:03d}.mp3"
-        video_path = temp_dir / f"output_{idx:03d}.mp4"
-
-        #Convert to CBR
-        convert_to_cbr(audio, cbr_audio)
-
-        print(f"Getting audio duration...")
-        duration = get_audio_duration(cbr_audio)
-        
-        trimmed_audio = output_dir / f"audio_trimmed_{idx:03d}.mp3"
-        trim_audio(cbr_audio, trimmed_audio, duration)
-
-        print(f"Running subprocess...")
-        print(f"Scale width: {RES_WIDTH}, Scale height: {RES_HEIGHT}")
-        vf_filter = (
-            f"scale='if(gt(a,{RES_WIDTH}/{RES_HEIGHT}),{RES_WIDTH},-1)':'if(gt(a,{RES_WIDTH}/{RES_HEIGHT}),-1,{RES_HEIGHT})',"
-            f"pad={RES_WIDTH}:{RES_HEIGHT}:(ow-iw)/2:(oh-ih)/2,setsar=1:1,format=yuv420p"
-        )
-        subprocess.run([
-            'ffmpeg', '-y', '-loop', '1', '-i', str(image),
-            '-i', str(trimmed_audio),
-            '-vf', vf_filter,
-            '-r', str(FPS),
-            '-c:v', 'libx264', '-preset', 'fast', '-tune', 'stillimage', '-shortest',
-            '-c:a', 'aac', '-b:a', '192k', '-ar', '48000', '-ac', '2',
-            '-t', f"{duration:.3f}", str(video_path)
-        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-        # Re-encode
-        print(f"Re-encoding...")
-        reencode_clip(video_path, temp_adj_dir / video_path.name)
-
-    # File list for ffmpeg concat
-    print(f"Writing filelist.txt...")
-    filelist_path = temp_adj_dir / 'filelist.txt'
-    with filelist_path.open('w') as f:
-        if bumper_path_in.exists():
-            f.write(f"file '{bumper_path_in}'\n")
-        for idx in range(1, len(image_files) + 1):
-            adj_path = temp_adj_dir / f"output_{idx:03d}.mp4"
-            if adj_path.exists():
-                f.write(f"file '{adj_path}'\n")
-        if bumper_path_out.exists():
-            f.write(f"file '{bumper_path_out}'\n")
+    def segment_path_for(idx):
+        return segment_file(temp_adj_dir, idx)
 
-    print(f"Starting concatenation...")
+    slides = [
+        (idx, image_files[key], audio_files[key], segment_path_for(idx))
+        for idx, key in enumerate(common_keys, 1)
+    ]
 
-    # First reencode bumpers
-    reencode_bumper(bumper_path_in, bumper_path_in_processed, RES_WIDTH, RES_HEIGHT, FPS)
-    reencode_bumper(bumper_path_out, bumper_path_out_processed, RES_WIDTH, RES_HEIGHT, FPS)
+    progress = JobProgress(job_id, file_id, progress_publisher.publish)
+
+    # First normalize bumpers (cached across jobs)
+    bumper_cache = ArtifactCache(BUMPER_CACHE_DIR, BUMPER_CACHE_MAX_BYTES)
+    progress.start_stage("bumpers", int(bumper_path_in.exists()) + int(bumper_path_out.exists()))
+    bumper_in_processed = prepare_bumper(bumper_path_in, temp_adj_dir / "bumper_in.mp4", bumper_cache, profile, progress)
+    bumper_out_processed = prepare_bumper(bumper_path_out, temp_adj_dir / "bumper_out.mp4", bumper_cache, profile, progress)
+    print(f"Bumper cache for job {job_id}: {bumper_cache.hits} hit(s), {bumper_cache.misses} miss(es)")
+
+    # Reuse segments rendered by earlier revisions and render identical slides once
+    segment_cache = ArtifactCache(SEGMENT_CACHE_DIR, SEGMENT_CACHE_MAX_BYTES)
+    renders, reused, duplicates = plan_segment_renders(slides, segment_cache, profile)
+    followers = {}
+    for idx, leader in duplicates.items():
+        followers.setdefault(leader, []).append(idx)
+
+    reuse_count = len(slides) - len(renders)
+    print(f"♻️ Segment reuse for job {job_id}: {reuse_count}/{len(slides)} slides "
+          f"({reuse_count / len(slides):.0%}) - {len(reused)} from earlier jobs, "
+          f"{len(duplicates)} duplicate(s) within the deck, {len(renders)} rendered")
+
+    # Large decks: hand the renders to chunk tasks and let the barrier run the concat
+    if FANOUT_CHUNK_SIZE > 0 and len(renders) > FANOUT_CHUNK_SIZE:
+        job = {
+            "job_id": job_id,
+            "file_id": file_id,
+            "profile": profile,
+            "slide_count": len(slides),
+            "chunks": [
+                [[idx, str(image), str(audio), str(path), key] for idx, image, audio, path, key in
+                 renders[start:start + FANOUT_CHUNK_SIZE]]
+                for start in range(0, len(renders), FANOUT_CHUNK_SIZE)
+            ],
+            "followers": {str(leader): idxs for leader, idxs in followers.items()},
+            "bumper_in": str(bumper_in_processed) if bumper_in_processed else None,
+            "bumper_out": str(bumper_out_processed) if bumper_out_processed else None,
+            "temp_dir": str(temp_dir),
+            "temp_adj_dir": str(temp_adj_dir),
+            "final_output": str(final_output),
+            "hls_dir": str(output_dir / "hls") if HLS_OUTPUT else None,
+            "started_at": time.time(),
+        }
+        if HLS_OUTPUT:
+            shutil.rmtree(output_dir / "hls", ignore_errors=True)
+        write_fanout(job)
+        for idx, cached in reused.items():
+            link_or_copy(cached, segment_path_for(idx))
+            for follower in followers.get(idx, []):
+                link_or_copy(cached, segment_path_for(follower))
+            mark_segments_ready(job, [idx] + followers.get(idx, []))
+        sync_fanout_playlist(job)
+
+        # The chunk that completes the barrier queues assemble_video
+        progress.start_stage("segments", len(renders))
+        for chunk_no in range(len(job["chunks"])):
+            render_chunk.delay(job_id, file_id, chunk_no)
+        print(f"🔀 Fanned out job {job_id}: {len(job['chunks'])} chunk(s) of up to "
+              f"{FANOUT_CHUNK_SIZE} slides on the video_producer queue")
+        return {"status": "fanned-out", "chunks": len(job["chunks"])}
+
+    # Progressive HLS: position 0 is the intro bumper, 1..N the slides, N+1 the outro
+    playlist = None
+    if HLS_OUTPUT:
+        playlist = ProgressivePlaylist(output_dir / "hls", HLS_SEGMENT_SECONDS, len(slides) + 2,
+                                       stream_announcer(job_id, file_id))
+        if bumper_in_processed:
+            playlist.add(0, bumper_in_processed, "bumper_in")
+        else:
+            playlist.skip(0)
+
+    def segment_done(idx):
+        for follower in followers.get(idx, []):
+            link_or_copy(segment_path_for(idx), segment_path_for(follower))
+        if playlist:
+            for ready in [idx] + followers.get(idx, []):
+                playlist.add(ready, segment_path_for(ready), f"slide_{ready:03d}")
+
+    for idx, cached in reused.items():
+        link_or_copy(cached, segment_path_for(idx))
+        segment_done(idx)
+
+    def render_job(idx, image, audio, segment_path, key):
+        render_slide_segment(idx, image, audio, segment_path, key, segment_cache, temp_dir, profile, progress)
+        segment_done(idx)
+
+    progress.start_stage("segments", len(renders))
+    if renders:
+        workers = min(render_workers(), len(renders))
+        print(f"Rendering {len(renders)} slide segments in {RENDER_MODE} mode with {workers} workers")
+        render_segments_parallel(renders, render_job, workers)
+        segment_cache.evict()
+
+    if playlist:
+        if bumper_out_processed:
+            playlist.add(len(slides) + 1, bumper_out_processed, "bumper_out")
+        else:
+            playlist.skip(len(slides) + 1)
 
     # Gather list of segments to concatenate, in the right order
     segments = []
-    if bumper_path_in.exists():
-        segments.append(str(bumper_path_in_processed))
+    if bumper_in_processed:
+        segments.append(str(bumper_in_processed))
     for idx in range(1, len(common_keys) + 1):
         seg_path = temp_adj_dir / f"output_{idx:03d}.mp4"
         if seg_path.exists():
             segments.append(str(seg_path))
-    if bumper_path_out.exists():
-        segments.append(str(bumper_path_out_processed))
-    
-    concat_with_filter_complex(segments, final_output)
+    if bumper_out_processed:
+        segments.append(str(bumper_out_processed))
 
-    async def send_download_ready_message(file_path, job_id, file_id):
-        try:
-            connection = await aio_pika.connect_robust(CELERY_BROKER_URL)
-            channel = await connection.channel()
-            await channel.declare_queue("download_ready", durable=True)
-            message = {
-                "event": "artifact-ready",
-                "file_path": str(file_path),
-                "job_id": job_id,
-                "file_id": file_id
-            }
-            await channel.default_exchange.publish(
-                aio_pika.Message(
-                    body=json.dumps(message).encode(),
-                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT
-                ),
-                routing_key="download_ready"
-            )
-            await connection.close()
-            print(f"Sent 'artifact-ready' message to 'download_ready' queue: {message}")
-        except Exception as e:
-            print("Failed to send artifact-ready message")
-            traceback.print_exc()
+    return finish_video(job_id, file_id, profile, segments, final_output, temp_adj_dir / 'filelist.txt',
+                        [temp_dir, temp_adj_dir], progress)
 
-    if final_output.exists():
-        print(f"✅ Final output video written to: {final_output}")
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        shutil.rmtree(temp_adj_dir, ignore_errors=True)
+@celery_app.task(bind=True, queue='video_producer', name="ffmpeg_service.render_chunk",
+                 acks_late=True, max_retries=FANOUT_MAX_RETRIES)
+def render_chunk(self, job_id, file_id, chunk_no):
+    """
+    Render one chunk of a fanned-out job. A failure retries only this chunk;
+    once retries run out the chunk is recorded as failed so the job still
+    reaches the barrier and assemble_video can report it.
+    """
+    job = load_fanout(job_id)
+    barrier = fanout_barrier(job)
+    if barrier.has_arrived(chunk_no):
+        print(f"Chunk {chunk_no} of job {job_id} already finished, skipping redelivery")
+        return
+    chunk = [(idx, Path(image), Path(audio), Path(path), key) for idx, image, audio, path, key in job["chunks"][chunk_no]]
+    profile = job["profile"]
+    followers = job["followers"]
+    temp_dir = Path(job["temp_dir"])
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    print(f"Rendering chunk {chunk_no + 1}/{len(job['chunks'])} of job {job_id} "
+          f"({len(chunk)} slides, attempt {self.request.retries + 1})")
 
-        print(f"Calling send_download_ready_message with file_id: {file_id}") 
-        asyncio.run(send_download_ready_message(
-            file_path=final_output,
-            job_id=job_id,
-            file_id=file_id
-        ))
-        print("Message send attempted.")
-        
-        return str(final_output)
-    else:
-        raise RuntimeError("❌ Final video creation failed.")
+    # Every chunk reports the whole job: renders done job-wide against all planned renders
+    progress = JobProgress(job_id, file_id, progress_publisher.publish,
+                           shared_done=lambda: fanout_renders_done(job))
+    progress.start_stage("segments", sum(len(c) for c in job["chunks"]), started_at=job.get("started_at"))
+    segment_cache = ArtifactCache(SEGMENT_CACHE_DIR, SEGMENT_CACHE_MAX_BYTES)
+
+    def render_job(idx, image, audio, segment_path, key):
+        if not (fanout_dir(job_id) / "ready" / str(idx)).exists():
+            render_slide_segment(idx, image, audio, segment_path, key, segment_cache, temp_dir, profile, progress)
+            for follower in followers.get(str(idx), []):
+                link_or_copy(segment_path, segment_file(job["temp_adj_dir"], follower))
+            mark_segments_ready(job, [idx] + followers.get(str(idx), []))
+        sync_fanout_playlist(job)
+
+    try:
+        render_segments_parallel(chunk, render_job, min(FANOUT_CHUNK_WORKERS, len(chunk)))
+    except Exception as e:
+        if self.request.retries < self.max_retries:
+            print(f"⚠️ Chunk {chunk_no} of job {job_id} failed ({e}), retrying")
+            raise self.retry(exc=e, countdown=FANOUT_RETRY_DELAY * 2 ** self.request.retries)
+        print(f"❌ Chunk {chunk_no} of job {job_id} failed after {self.request.retries + 1} attempts")
+        if barrier.arrive(chunk_no, ok=False):
+            assemble_video.delay(job_id, file_id)
+        raise
+    segment_cache.evict()
+
+    if barrier.arrive(chunk_no):
+        print(f"All {len(job['chunks'])} chunks of job {job_id} rendered, queueing assembly")
+        assemble_video.delay(job_id, file_id)
+
+@celery_app.task(queue='video_producer', name="ffmpeg_service.assemble_video", acks_late=True)
+def assemble_video(job_id, file_id):
+    """Join step of a fanned-out job: concat every segment and emit artifact-ready."""
+    job = load_fanout(job_id)
+    failed = fanout_barrier(job).failed()
+    if failed:
+        raise RuntimeError(f"❌ Job {job_id} has failed render chunk(s): {', '.join(failed)}")
+
+    sync_fanout_playlist(job)
+    segments = [job["bumper_in"]] if job["bumper_in"] else []
+    segments += [str(segment_file(job["temp_adj_dir"], idx)) for idx in range(1, job["slide_count"] + 1)]
+    if job["bumper_out"]:
+        segments.append(job["bumper_out"])
 
+    progress = JobProgress(job_id, file_id, progress_publisher.publish)
+    return finish_video(job_id, file_id, job["profile"], segments, job["final_output"],
+                        Path(job["temp_adj_dir"]) / 'filelist.txt',
+                        [job["temp_dir"], job["temp_adj_dir"], fanout_dir(job_id)], progress)
@@ -0,0 +1,148 @@
+import fcntl
+import json
+import math
+import os
+import subprocess
+import threading
+from pathlib import Path
+
+
+class ProgressivePlaylist:
+    """
+    HLS EVENT playlist that grows while a job renders.
+
+    Clips (bumpers and slide segments) are added by position as they finish,
+    in any order; the playlist only ever grows by the contiguous run of
+    positions from the start, so viewers always see clips in final order.
+    Each clip is cut into MPEG-TS chunks with a stream copy and appended after
+    an EXT-X-DISCONTINUITY, since every clip restarts its timestamps at zero.
+    Any ffmpeg failure disables the playlist instead of failing the render.
+
+    With a state_path the appended clips are saved after every add and
+    restored on construction, so workers rendering parts of one job can take
+    turns growing the same playlist (see append_ready_clips).
+    """
+
+    def __init__(self, hls_dir, segment_seconds, clip_count, on_update=None, state_path=None):
+        self.hls_dir = Path(hls_dir)
+        self.hls_dir.mkdir(parents=True, exist_ok=True)
+        self.playlist_path = self.hls_dir / "index.m3u8"
+        self.segment_seconds = segment_seconds
+        self.target_duration = int(math.ceil(segment_seconds)) + 1
+        self.clip_count = clip_count
+        self.on_update = on_update
+        self.clips = []
+        self.broken = False
+        self._pending = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self.state_path = Path(state_path) if state_path else None
+        if self.state_path and self.state_path.exists():
+            state = json.loads(self.state_path.read_text())
+            self.clips = [[tuple(chunk) for chunk in clip] for clip in state["clips"]]
+            self._next = state["next"]
+            self.broken = state["broken"]
+
+    def add(self, position, clip_path, name):
+        """Make clip `position` available; None marks a position with no clip."""
+        with self._lock:
+            self._pending[position] = (clip_path, name)
+            appended = False
+            while self._next in self._pending and not self.broken:
+                clip_path, name = self._pending.pop(self._next)
+                if clip_path is not None:
+                    appended = self._append(clip_path, name) or appended
+                self._next += 1
+            if appended or self.finished:
+                self._write()
+                if self.on_update and not self.broken:
+                    self.on_update(self)
+            self._save_state()
+
+    def skip(self, position):
+        self.add(position, None, None)
+
+    @property
+    def next_position(self):
+        return self._next
+
+    @property
+    def finished(self):
+        return self._next >= self.clip_count
+
+    def _append(self, clip_path, name):
+        chunk_list = self.hls_dir / f".{name}.m3u8"
+        result = subprocess.run([
+            'ffmpeg', '-y', '-i', str(clip_path),
+            '-map', '0:v:0', '-map', '0:a:0', '-c', 'copy',
+            '-f', 'hls', '-hls_time', str(self.segment_seconds),
+            '-hls_list_size', '0', '-hls_playlist_type', 'vod',
+            '-hls_segment_filename', str(self.hls_dir / f"{name}_%03d.ts"),
+            str(chunk_list)
+        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            print(f"⚠️ HLS packaging failed for {clip_path}, stopping progressive output")
+            print(result.stderr.decode())
+            self.broken = True
+            return False
+
+        chunks = []
+        duration = None
+        for line in chunk_list.read_text().splitlines():
+            if line.startswith("#EXTINF:"):
+                duration = float(line[len("#EXTINF:"):].split(",")[0])
+            elif line and not line.startswith("#"):
+                chunks.append((duration, Path(line).name))
+        chunk_list.unlink(missing_ok=True)
+        self.clips.append(chunks)
+        print(f"📺 Appended {name} to HLS playlist ({len(chunks)} chunks)")
+        return True
+
+    def _write(self):
+        longest = max((d for clip in self.clips for d, _ in clip), default=0)
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{max(self.target_duration, int(math.ceil(longest)))}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+        ]
+        for i, clip in enumerate(self.clips):
+            if i > 0:
+                lines.append("#EXT-X-DISCONTINUITY")
+            for duration, filename in clip:
+                lines += [f"#EXTINF:{duration:.3f},", filename]
+        if self.finished and not self.broken:
+            lines.append("#EXT-X-ENDLIST")
+        temp_path = self.playlist_path.with_suffix(".m3u8.tmp")
+        temp_path.write_text("\n".join(lines) + "\n")
+        os.replace(temp_path, self.playlist_path)
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        temp_path = self.state_path.with_suffix(".tmp")
+        temp_path.write_text(json.dumps({"clips": self.clips, "next": self._next, "broken": self.broken}))
+        os.replace(temp_path, self.state_path)
+
+
+def append_ready_clips(hls_dir, segment_seconds, clip_count, ready_clip, on_update=None):
+    """
+    Grow a playlist shared by several workers. Under an exclusive lock on the
+    shared volume, restore the saved playlist and append clips in order for as
+    long as they are ready. ready_clip(position) returns None while that clip
+    is still rendering, otherwise (clip_path, name) with clip_path None for a
+    position that has no clip.
+    """
+    hls_dir = Path(hls_dir)
+    hls_dir.mkdir(parents=True, exist_ok=True)
+    with open(hls_dir / ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        playlist = ProgressivePlaylist(hls_dir, segment_seconds, clip_count, on_update,
+                                       state_path=hls_dir / ".state.json")
+        while not playlist.finished and not playlist.broken:
+            clip = ready_clip(playlist.next_position)
+            if clip is None:
+                break
+            playlist.add(playlist.next_position, *clip)
+        return playlist
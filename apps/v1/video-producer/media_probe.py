@@ -0,0 +1,106 @@
+import json
+import os
+import subprocess
+import threading
+import wave
+from collections import OrderedDict
+from pathlib import Path
+
+# Parsed ffprobe results kept per worker process.
+PROBE_CACHE_SIZE = int(os.getenv("PROBE_CACHE_SIZE", "1024"))
+
+# Stream fields that must match across segments for a -c copy concat. MP4
+# keeps SPS/PPS only in the extradata, so that has to be identical too.
+VIDEO_LAYOUT_KEYS = ("codec_name", "profile", "level", "width", "height", "pix_fmt", "r_frame_rate",
+                     "time_base", "sample_aspect_ratio", "extradata_hash")
+AUDIO_LAYOUT_KEYS = ("codec_name", "profile", "sample_rate", "channels", "channel_layout", "extradata_hash")
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def probe(path):
+    """
+    Format and stream metadata for a media file from a single
+    `ffprobe -print_format json` call. Results are memoized by
+    path + mtime + size, so a rewritten file is probed again.
+    """
+    path = Path(path)
+    st = path.stat()
+    key = (str(path.resolve()), st.st_mtime_ns, st.st_size)
+    with _lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+
+    result = subprocess.run([
+        'ffprobe', '-v', 'error', '-print_format', 'json',
+        '-show_format', '-show_streams', '-show_data_hash', 'sha256',
+        str(path)
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe failed for {path}: {result.stderr.strip()}")
+    info = json.loads(result.stdout)
+
+    with _lock:
+        _cache[key] = info
+        while len(_cache) > PROBE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return info
+
+
+def duration(path):
+    """Seconds of media. PCM WAV is read from its header without ffprobe."""
+    if Path(path).suffix.lower() == ".wav":
+        try:
+            with wave.open(str(path), "rb") as w:
+                return w.getnframes() / float(w.getframerate())
+        except (wave.Error, EOFError):
+            pass  # e.g. WAVE_FORMAT_EXTENSIBLE or float PCM; let ffprobe handle it
+    return float(probe(path)["format"]["duration"])
+
+
+def dimensions(path):
+    """(width, height) of the first video stream; also works on still images."""
+    video = streams(path, "video")[0]
+    return int(video["width"]), int(video["height"])
+
+
+def bit_rate(path):
+    return probe(path)["format"].get("bit_rate")
+
+
+def streams(path, codec_type=None):
+    return [s for s in probe(path).get("streams", [])
+            if codec_type is None or s.get("codec_type") == codec_type]
+
+
+def stream_layout(path):
+    """Per-stream tuples of the fields that decide stream-copy compatibility."""
+    layout = []
+    for stream in streams(path):
+        codec_type = stream.get("codec_type")
+        if codec_type == "video":
+            keys = VIDEO_LAYOUT_KEYS
+        elif codec_type == "audio":
+            keys = AUDIO_LAYOUT_KEYS
+        else:
+            continue
+        layout.append((codec_type,) + tuple(stream.get(k) for k in keys))
+    return tuple(layout)
+
+
+def describe(path):
+    """Human-readable diagnostics: duration, stream list and A/V parameters."""
+    info = probe(path)
+    lines = [f"{path} duration: {info['format'].get('duration')}"]
+    for s in info.get("streams", []):
+        if s.get("codec_type") == "video":
+            lines.append(f"  {s['index']} video: {s.get('codec_name')} {s.get('width')}x{s.get('height')} "
+                         f"{s.get('r_frame_rate')} {s.get('pix_fmt')}")
+        elif s.get("codec_type") == "audio":
+            lines.append(f"  {s['index']} audio: {s.get('codec_name')} {s.get('sample_rate')}Hz "
+                         f"{s.get('channels')}ch {s.get('sample_fmt')}")
+        else:
+            lines.append(f"  {s['index']} {s.get('codec_type')}")
+    return "\n".join(lines)
@@ -0,0 +1,160 @@
+import os
+import subprocess
+import threading
+import time
+
+# Minimum seconds between progress events for one job.
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "2"))
+
+
+def _seconds(block):
+    # ffmpeg reports out_time_ms in microseconds as well, despite the name.
+    for key in ("out_time_us", "out_time_ms"):
+        value = block.get(key, "N/A")
+        if value not in ("N/A", ""):
+            return max(0.0, int(value) / 1_000_000)
+    return None
+
+
+def _number(value):
+    try:
+        return float(str(value).rstrip("x"))
+    except ValueError:
+        return None
+
+
+class JobProgress:
+    """
+    Latest ffmpeg progress for every render of one job.
+
+    Each ffmpeg call is tracked under a label (a slide, a bumper, the concat).
+    A job moves through stages; within a stage, percent counts finished files
+    plus the out_time fraction of files still running. Events are handed to
+    `publish` at most every `interval` seconds, plus once on every stage
+    change, so fast renders don't flood the broker.
+
+    When a stage is split across workers, `shared_done` returns how many of
+    its files are finished job-wide (e.g. counted from markers on the shared
+    volume). It replaces this instance's own count, so every worker reports
+    the same job-level percent and ETA, with its running files under "files".
+    """
+
+    def __init__(self, job_id, file_id, publish, interval=PROGRESS_INTERVAL, shared_done=None):
+        self.job_id = job_id
+        self.file_id = file_id
+        self.interval = interval
+        self._publish = publish
+        self._shared_done = shared_done
+        self._lock = threading.Lock()
+        self._last_publish = 0.0
+        self.stage = "queued"
+        self.total = 0
+        self.done = 0
+        self.files = {}
+        self.stage_started = time.monotonic()
+
+    def start_stage(self, stage, total, started_at=None):
+        """started_at: wall-clock start of a stage that began elsewhere, for the ETA."""
+        with self._lock:
+            self.stage = stage
+            self.total = total
+            self.done = 0
+            self.files = {}
+            self.stage_started = time.monotonic()
+            if started_at is not None:
+                self.stage_started -= max(0.0, time.time() - started_at)
+        self.publish(force=True)
+
+    def expect(self, label, duration):
+        with self._lock:
+            self.files[label] = {"duration": duration, "out_time": 0.0, "speed": None, "fps": None}
+
+    def update(self, label, block):
+        with self._lock:
+            entry = self.files.setdefault(label, {"duration": None, "out_time": 0.0, "speed": None, "fps": None})
+            out_time = _seconds(block)
+            if out_time is not None:
+                entry["out_time"] = out_time
+            entry["speed"] = _number(block.get("speed", "N/A"))
+            entry["fps"] = _number(block.get("fps", "N/A"))
+        self.publish()
+
+    def file_done(self, label):
+        with self._lock:
+            self.files.pop(label, None)
+            self.done += 1
+        self.publish()
+
+    def snapshot(self):
+        shared_done = self._shared_done() if self._shared_done else None
+        with self._lock:
+            done = self.done if shared_done is None else shared_done
+            units = float(done)
+            for entry in self.files.values():
+                if entry["duration"]:
+                    units += min(1.0, entry["out_time"] / entry["duration"])
+            percent = 100.0 if self.total == 0 else min(100.0, 100.0 * units / self.total)
+            elapsed = time.monotonic() - self.stage_started
+            eta = elapsed * (self.total - units) / units if units > 0 else None
+            return {
+                "event": "render-progress",
+                "job_id": self.job_id,
+                "file_id": self.file_id,
+                "stage": self.stage,
+                "files_done": done,
+                "files_total": self.total,
+                "percent": round(percent, 1),
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+                "files": {
+                    label: {
+                        "out_time": round(entry["out_time"], 2),
+                        "duration": entry["duration"],
+                        "speed": entry["speed"],
+                        "fps": entry["fps"],
+                    }
+                    for label, entry in self.files.items()
+                },
+                "updated_at": time.time(),
+            }
+
+    def publish(self, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_publish < self.interval:
+                return
+            self._last_publish = now
+        try:
+            self._publish(self.snapshot())
+        except Exception as e:
+            print(f"⚠️ Failed to publish progress for job {self.job_id}: {e}")
+
+
+def run_ffmpeg(cmd, progress=None, label=None, duration=None):
+    """
+    Run an ffmpeg command and return (returncode, stderr). With a
+    JobProgress, `-progress pipe:1` output is parsed and reported under label.
+    """
+    if progress is None:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return result.returncode, result.stderr.decode(errors="replace")
+
+    progress.expect(label, duration)
+    cmd = [cmd[0], '-progress', 'pipe:1', '-nostats'] + list(cmd[1:])
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    stderr = []
+    # Drain stderr alongside stdout so a chatty encoder can't block on a full pipe.
+    reader = threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)
+    reader.start()
+
+    block = {}
+    for line in proc.stdout:
+        key, _, value = line.strip().partition("=")
+        block[key] = value
+        if key == "progress":
+            progress.update(label, block)
+            block = {}
+    proc.wait()
+    reader.join()
+    if proc.returncode == 0:
+        progress.file_done(label)
+    return proc.returncode, "".join(stderr)
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+import queue
+import threading
+
+import aio_pika
+
+from progress_queue import RENDER_PROGRESS_ARGUMENTS, RENDER_PROGRESS_QUEUE
+
+
+class ProgressPublisher:
+    """
+    Sends render-progress events to the broker from one background thread
+    per worker process over a single long-lived connection, so the render
+    threads that report progress only put an event on a local queue. When
+    the broker is slow or unreachable the oldest pending events are dropped;
+    only the latest one per job matters.
+    """
+
+    def __init__(self, broker_url, max_pending=256):
+        self.broker_url = broker_url
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._events = None
+        self._thread = None
+        self._pid = None
+
+    def publish(self, message):
+        events = self._running_queue()
+        while True:
+            try:
+                events.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    events.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _running_queue(self):
+        with self._lock:
+            # Celery forks its pool after import, so each child starts its own thread
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._events = queue.Queue(maxsize=self.max_pending)
+                self._thread = threading.Thread(target=asyncio.run, args=(self._pump(self._events),),
+                                                name="progress-publisher", daemon=True)
+                self._thread.start()
+            return self._events
+
+    async def _pump(self, events):
+        connection = channel = None
+        while True:
+            # Poll rather than block, so the loop keeps serving the connection's heartbeats
+            try:
+                message = events.get_nowait()
+            except queue.Empty:
+                await asyncio.sleep(0.1)
+                continue
+            try:
+                if connection is None or connection.is_closed:
+                    connection = await aio_pika.connect_robust(self.broker_url)
+                    channel = await connection.channel()
+                    await channel.declare_queue(RENDER_PROGRESS_QUEUE, durable=True,
+                                                arguments=RENDER_PROGRESS_ARGUMENTS)
+                await channel.default_exchange.publish(
+                    aio_pika.Message(body=json.dumps(message).encode()),
+                    routing_key=RENDER_PROGRESS_QUEUE
+                )
+            except Exception as e:
+                print(f"⚠️ Failed to publish progress for job {message.get('job_id')}: {e}")
+                if connection is not None:
+                    try:
+                        await connection.close()
+                    except Exception:
+                        pass
+                connection = None